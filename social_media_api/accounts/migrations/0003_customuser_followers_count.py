@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_followers_count(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    counts = CustomUser.objects.annotate(n=Count('followers')).filter(n__gt=0)
+    for user_id, n in list(counts.values_list('id', 'n')):
+        CustomUser.objects.filter(id=user_id).update(followers_count=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_remove_customuser_followers_customuser_following'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_followers_count, migrations.RunPython.noop),
+    ]
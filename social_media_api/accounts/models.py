@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 
 # Create your models here.
@@ -7,9 +9,18 @@ class CustomUser(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     following = models.ManyToManyField('self', symmetrical=False, related_name='followers', blank=True)
+    # Denormalized so the feed can tell high-follower authors apart without counting.
+    followers_count = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return self.username
-    
 
-    
+
+def followers_recount():
+    """Each user's follower count from the follow table, for use in ``update()``."""
+    Follow = CustomUser.following.through
+    counts = (
+        Follow.objects.filter(to_customuser=OuterRef('pk'))
+        .values('to_customuser').annotate(n=Count('*')).values('n')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
@@ -3,16 +3,19 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
+from posts.fieldsets import SparseFieldsMixin
 
 #s = get_user_model().objects.create_user
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Only rendered with ?expand=following / ?expand=followers.
     following = serializers.StringRelatedField(many=True, read_only=True)
     followers = serializers.StringRelatedField(many=True, read_only=True)
 
     class Meta:
         model = CustomUser
         fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'following', 'followers']
+        expandable_fields = ['following', 'followers']
 
     def get_followers_count(self, obj):
         return obj.followers.count()
@@ -6,7 +6,14 @@ from rest_framework.response import Response
 from .models import CustomUser
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from django.db.models import F
 from notifications.utils import create_notification
+from posts.feed_cache import bump_feed_generations
+from posts.fieldsets import sparse_queryset
+from posts.models import TimelineTask
+from posts.purge import delete_user
+from posts.serializers import PurgeJobSerializer
+from posts.tasks import enqueue_timeline_task
 
 
 # Create your views here.
@@ -27,19 +34,27 @@ class CustomUserLoginView(generics.GenericAPIView):
             "token": serializer.validated_data["token"]
         })
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CustomUserSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Deactivate the account at once and purge its content in the
+        background. Answers 202 with the purge job.
+        """
+        job = delete_user(request.user)
+        return Response(PurgeJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
     
 
 class FollowUserView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, user_id):
-        user_to_follow = get_object_or_404(CustomUser, id=user_id)
+        user_to_follow = get_object_or_404(CustomUser, id=user_id, is_active=True)
 
         if user_to_follow == request.user:
             return Response(
@@ -47,7 +62,18 @@ class FollowUserView(generics.GenericAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        request.user.following.add(user_to_follow)
+        # Only the request that inserts the row counts it, so concurrent
+        # follows cannot count twice.
+        _, created = CustomUser.following.through.objects.get_or_create(
+            from_customuser=request.user, to_customuser=user_to_follow
+        )
+        if created:
+            CustomUser.objects.filter(id=user_to_follow.id).update(
+                followers_count=F('followers_count') + 1
+            )
+            user_to_follow.refresh_from_db(fields=['followers_count'])
+            enqueue_timeline_task(request.user, user_to_follow, TimelineTask.BACKFILL)
+            bump_feed_generations([request.user.id])
         
         create_notification(
             recipient=user_to_follow,
@@ -66,7 +92,17 @@ class UnfollowUserView(generics.GenericAPIView):
     def post(self, request, user_id):
         user_to_unfollow = get_object_or_404(CustomUser, id=user_id)
 
-        request.user.following.remove(user_to_unfollow)
+        deleted, _ = CustomUser.following.through.objects.filter(
+            from_customuser=request.user, to_customuser=user_to_unfollow
+        ).delete()
+        if deleted:
+            # A count that has already drifted to 0 is left for
+            # reconcile_post_counters rather than failing the CHECK.
+            CustomUser.objects.filter(id=user_to_unfollow.id, followers_count__gt=0).update(
+                followers_count=F('followers_count') - 1
+            )
+            enqueue_timeline_task(request.user, user_to_unfollow, TimelineTask.PURGE)
+            bump_feed_generations([request.user.id])
 
         return Response({
             "message": f"You unfollowed {user_to_unfollow.username}.",
@@ -79,7 +115,7 @@ class GetFollowersListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.request.user.followers.all()
+        return sparse_queryset(self.request.user.followers.all(), self.get_serializer())
     
 #permissions.IsAuthenticated
 #CustomUser.objects.all()
\ No newline at end of file
@@ -1,9 +1,11 @@
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from notifications.models import Notification
 from accounts.serializers import CustomUserSerializer
+from posts.fieldsets import SparseFieldsMixin
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     actor = CustomUserSerializer(read_only=True)
     target_type = serializers.SerializerMethodField()
     target_id = serializers.IntegerField(source='target_object_id', read_only=True)
@@ -12,9 +14,11 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = ['id', 'actor', 'verb', 'target_type', 'target_id', 'is_read', 'timestamp']
         read_only_fields = ['id', 'actor', 'verb', 'target_type', 'target_id', 'timestamp']
+        field_sources = {'target_type': ['target_content_type']}
     
     def get_target_type(self, obj):
         """Return the model name of the target object"""
-        if obj.target_content_type:
-            return obj.target_content_type.model
+        # get_for_id is served from ContentType's cache, not a query per row.
+        if obj.target_content_type_id:
+            return ContentType.objects.get_for_id(obj.target_content_type_id).model
         return None
\ No newline at end of file
@@ -27,3 +27,27 @@ def create_notification(recipient, actor, verb, target=None):
         notification_data['target_object_id'] = target.id
     
     return Notification.objects.create(**notification_data)
+
+
+def create_notifications(actor, verb, notifications):
+    """
+    Create many notifications for one action with a single query.
+    
+    Args:
+        actor: The user who performed the action
+        verb: Description of the action (e.g., "liked your post")
+        notifications: Iterable of (recipient, target) pairs; target may be None
+    """
+    objs = []
+    for recipient, target in notifications:
+        # Don't create notification if actor is the recipient
+        if recipient == actor:
+            continue
+        
+        notification = Notification(recipient=recipient, actor=actor, verb=verb)
+        if target:
+            notification.target_content_type = ContentType.objects.get_for_model(target)
+            notification.target_object_id = target.id
+        objs.append(notification)
+    
+    return Notification.objects.bulk_create(objs)
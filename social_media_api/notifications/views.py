@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from notifications.models import Notification
 from notifications.serializers import NotificationSerializer
+from posts.fieldsets import sparse_queryset
 
 
 class NotificationListView(generics.ListAPIView):
@@ -15,9 +16,10 @@ class NotificationListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(
+        queryset = Notification.objects.filter(
             recipient=self.request.user
         ).order_by('-is_read', '-timestamp')
+        return sparse_queryset(queryset, self.get_serializer())
 
 
 class UnreadNotificationListView(generics.ListAPIView):
@@ -28,10 +30,11 @@ class UnreadNotificationListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(
+        queryset = Notification.objects.filter(
             recipient=self.request.user,
             is_read=False
         ).order_by('-timestamp')
+        return sparse_queryset(queryset, self.get_serializer())
 
 
 class MarkNotificationAsReadView(APIView):
@@ -0,0 +1,168 @@
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Post, Comment
+
+# Cached in place of rows that do not exist, so repeated lookups of a bad ID
+# do not reach the database either.
+MISSING = '__missing__'
+
+
+class ObjectCache:
+    """
+    Read-through cache of model instances keyed by primary key.
+
+    Instances are cached for the number of seconds named by
+    ``timeout_setting`` and dropped by the ``posts.signals`` receivers when
+    they are saved or deleted (callers that write with ``update()`` call
+    ``invalidate`` themselves). Only the cache's get/set/add/delete calls are
+    used, so it works on the locmem, file and memcached/Redis backends alike.
+
+    On a miss, a single request recomputes the key: it takes a short lock
+    with ``cache.add`` while the others poll the cache for up to
+    ``OBJECT_CACHE_LOCK_TIMEOUT`` seconds before reading the row themselves.
+    """
+
+    def __init__(self, model, prefix, timeout_setting, defer=(), select_related=()):
+        self.model = model
+        self.prefix = prefix
+        self.timeout_setting = timeout_setting
+        self.defer = defer
+        self.select_related = select_related
+
+    def key(self, pk):
+        return f'{self.prefix}:{pk}'
+
+    @property
+    def timeout(self):
+        return getattr(settings, self.timeout_setting)
+
+    def get_queryset(self):
+        queryset = self.model.objects.defer(*self.defer)
+        # select_related() with no fields would follow every foreign key.
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        return queryset
+
+    def get(self, pk):
+        """Return the instance with primary key ``pk``, or None if there is none."""
+        value = cache.get(self.key(pk))
+        if value is None:
+            value = self.load(pk)
+        return None if value == MISSING else value
+
+    def load(self, pk):
+        key = self.key(pk)
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, timeout=settings.OBJECT_CACHE_LOCK_TIMEOUT):
+            try:
+                return self.fetch(pk)
+            finally:
+                cache.delete(lock_key)
+
+        deadline = time.monotonic() + settings.OBJECT_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(settings.OBJECT_CACHE_LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        # The recomputing request is taking too long; don't wait on it.
+        return self.get_queryset().filter(pk=pk).first() or MISSING
+
+    def fetch(self, pk):
+        instance = self.get_queryset().filter(pk=pk).first()
+        if instance is None:
+            cache.set(self.key(pk), MISSING, timeout=settings.OBJECT_CACHE_MISSING_TIMEOUT)
+            return MISSING
+        cache.set(self.key(pk), instance, timeout=self.timeout)
+        return instance
+
+    def get_many(self, pks):
+        """
+        Return ``{pk: instance}`` for the ``pks`` that exist, with one
+        ``get_many`` for the hits and one ``IN`` query for the misses.
+        """
+        keys = {self.key(pk): pk for pk in pks}
+        instances = {keys[key]: value for key, value in cache.get_many(keys).items()}
+
+        misses = [pk for pk in pks if pk not in instances]
+        if misses:
+            fetched = self.get_queryset().in_bulk(misses)
+            cache.set_many(
+                {self.key(pk): instance for pk, instance in fetched.items()},
+                timeout=self.timeout,
+            )
+            instances.update(fetched)
+        return {pk: instance for pk, instance in instances.items() if instance != MISSING}
+
+    def set_many(self, instances):
+        """Cache instances the caller has just read from the database."""
+        cache.set_many({self.key(instance.pk): instance for instance in instances}, timeout=self.timeout)
+
+    def invalidate(self, pks):
+        """
+        Drop cached copies of these rows after they changed.
+
+        Keys are deleted again once the transaction commits, in case another
+        request cached the old row in between.
+        """
+        keys = [self.key(pk) for pk in pks]
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+post_cache = ObjectCache(Post, 'posts:post', 'POST_CACHE_TIMEOUT', defer=('viewers_sketch',))
+comment_cache = ObjectCache(Comment, 'posts:comment', 'COMMENT_CACHE_TIMEOUT', select_related=('author',))
+
+
+def get_posts(post_ids):
+    """Return ``{post_id: Post}`` for the ``post_ids`` that exist, through the cache."""
+    return post_cache.get_many(post_ids)
+
+
+def invalidate_posts(post_ids):
+    post_cache.invalidate(post_ids)
+
+
+def author_generation_key(author_id):
+    return f'posts:author:gen:{author_id}'
+
+
+def bump_author_generations(author_ids):
+    generation = uuid.uuid4().hex
+    cache.set_many({author_generation_key(author_id): generation for author_id in author_ids}, timeout=None)
+
+
+def invalidate_author_pages(author_ids):
+    """
+    Make every cached first page of these authors unreachable, now and
+    again once the transaction commits.
+    """
+    author_ids = list(author_ids)
+    bump_author_generations(author_ids)
+    transaction.on_commit(lambda: bump_author_generations(author_ids))
+
+
+class AuthorPageCache:
+    """
+    Caches the post IDs on the first page of an author's posts for
+    ``AUTHOR_PAGE_CACHE_TIMEOUT`` seconds.
+
+    Only IDs are cached, one extra to tell whether there is a next page. The
+    posts themselves come from ``post_cache`` and are hydrated per viewer, so
+    ``liked_by_me`` and counts stay correct. Keys include the author's
+    generation, which ``invalidate_author_pages`` bumps when the author
+    creates, edits or deletes a post.
+    """
+
+    def __init__(self, author_id, limit):
+        generation = cache.get(author_generation_key(author_id), '')
+        self.key = f'posts:author:page:{author_id}:{generation}:{limit}'
+
+    def get(self):
+        return cache.get(self.key)
+
+    def set(self, post_ids):
+        cache.set(self.key, post_ids, timeout=settings.AUTHOR_PAGE_CACHE_TIMEOUT)
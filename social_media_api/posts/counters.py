@@ -0,0 +1,142 @@
+import random
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+from .cache import invalidate_posts
+from .models import Post, LikeCounterShard
+from .ranking import refresh_scores
+
+
+def like_total_cache_key(post_id):
+    return f'posts:like-total:{post_id}'
+
+
+def adjust_like_count(post, delta):
+    """
+    Atomically add ``delta`` to a post's like total.
+
+    Unsharded posts update ``Post.like_count`` directly. Sharded posts update
+    one of their ``LikeCounterShard`` rows at random and bump the cached total.
+    The post's ranking score is refreshed afterwards.
+    """
+    if not post.like_shards:
+        Post.objects.filter(pk=post.pk).update(like_count=F('like_count') + delta)
+        invalidate_posts([post.pk])
+        if delta > 0:
+            record_like_rate(post)
+    else:
+        adjust_like_shard(post, delta)
+    refresh_scores([post])
+
+
+def adjust_like_shard(post, delta):
+    LikeCounterShard.objects.filter(
+        post_id=post.pk, shard=random.randrange(post.like_shards)
+    ).update(count=F('count') + delta)
+    try:
+        cache.incr(like_total_cache_key(post.pk), delta)
+    except ValueError:
+        # Not cached; the next read recomputes it from the shards.
+        pass
+
+
+def adjust_like_counts(posts, delta):
+    """
+    Add ``delta`` to the like total of every post in ``posts``.
+
+    Unsharded posts are updated together with one UPDATE; sharded posts
+    each update one random shard. Scores are refreshed with one more UPDATE.
+    """
+    unsharded = [post for post in posts if not post.like_shards]
+    if unsharded:
+        Post.objects.filter(pk__in=[post.pk for post in unsharded]).update(
+            like_count=F('like_count') + delta
+        )
+        invalidate_posts([post.pk for post in unsharded])
+    for post in posts:
+        if post.like_shards:
+            adjust_like_shard(post, delta)
+        elif delta > 0:
+            record_like_rate(post)
+    refresh_scores(posts)
+
+
+def adjust_comment_count(post, delta):
+    """Atomically add ``delta`` to a post's ``comment_count`` and refresh its score."""
+    Post.objects.filter(pk=post.pk).update(comment_count=F('comment_count') + delta)
+    invalidate_posts([post.pk])
+    refresh_scores([post])
+
+
+def record_like_rate(post):
+    """
+    Count likes per post per minute and shard the post once the count
+    reaches ``LIKE_SHARD_PROMOTION_RATE``.
+    """
+    key = f'posts:like-rate:{post.pk}:{int(time.time() // 60)}'
+    cache.add(key, 0, timeout=120)
+    try:
+        rate = cache.incr(key)
+    except ValueError:
+        return
+    if rate >= settings.LIKE_SHARD_PROMOTION_RATE:
+        promote_to_sharded(post)
+
+
+def promote_to_sharded(post, shards=None):
+    """
+    Switch ``post`` to sharded like counting.
+
+    The existing ``like_count`` stays as the base of the total, so nothing has
+    to be moved; new likes simply start landing on the shards.
+    """
+    shards = shards or settings.LIKE_COUNTER_SHARDS
+    LikeCounterShard.objects.bulk_create(
+        [LikeCounterShard(post_id=post.pk, shard=shard) for shard in range(shards)],
+        ignore_conflicts=True,
+    )
+    Post.objects.filter(pk=post.pk, like_shards=0).update(like_shards=shards)
+    invalidate_posts([post.pk])
+    post.like_shards = shards
+
+
+def get_like_total(post):
+    """
+    Return the like total for ``post``.
+
+    Sharded totals are summed once and cached for ``LIKE_TOTAL_CACHE_TIMEOUT``
+    seconds; writes keep the cached value current with ``cache.incr``.
+    """
+    return get_like_totals([post])[post.pk]
+
+
+def get_like_totals(posts):
+    """
+    Return ``{post_id: like total}`` for ``posts``.
+
+    Unsharded totals come straight from the rows. Sharded totals are read
+    from the cache in one call, and any misses are summed with a single
+    grouped query over their shards.
+    """
+    totals = {post.pk: post.like_count for post in posts}
+    sharded = {post.pk: post for post in posts if post.like_shards}
+    if not sharded:
+        return totals
+
+    keys = {like_total_cache_key(post_id): post_id for post_id in sharded}
+    for key, total in cache.get_many(keys).items():
+        totals[keys[key]] = total
+        del sharded[keys[key]]
+
+    if sharded:
+        shard_sums = dict(
+            LikeCounterShard.objects.filter(post_id__in=sharded)
+            .values('post').annotate(total=Sum('count')).values_list('post', 'total')
+        )
+        for post_id, post in sharded.items():
+            total = post.like_count + (shard_sums.get(post_id) or 0)
+            totals[post_id] = total
+            cache.add(like_total_cache_key(post_id), total, timeout=settings.LIKE_TOTAL_CACHE_TIMEOUT)
+
+    return totals
@@ -0,0 +1,152 @@
+import hashlib
+import uuid
+from urllib.parse import parse_qs, urlparse
+from django.conf import settings
+from django.core.cache import cache
+
+HITS_KEY = 'feed:cache:hits'
+MISSES_KEY = 'feed:cache:misses'
+
+
+def generation_key(user_id):
+    return f'feed:gen:{user_id}'
+
+
+def bump_feed_generations(user_ids):
+    """
+    Invalidate every cached feed page of these users.
+
+    Generations are random tokens rather than counters, so an evicted
+    generation can never come back with a value an old page was cached under.
+    """
+    generation = uuid.uuid4().hex
+    cache.set_many({generation_key(user_id): generation for user_id in user_ids}, timeout=None)
+
+
+def author_generation_key(author_id):
+    return f'feed:gen:author:{author_id}'
+
+
+def bump_pull_generation(author_id):
+    """
+    Invalidate the cached feed pages of everyone following pull author
+    ``author_id``, whose posts are not pushed to any timeline.
+    """
+    cache.set(author_generation_key(author_id), uuid.uuid4().hex, timeout=None)
+
+
+def followed_pull_authors(user, user_generation):
+    """
+    IDs of the pull authors ``user`` follows, cached alongside their pages.
+
+    The list is keyed by the user's generation, which following and
+    unfollowing bump. An author crossing the threshold shows up within
+    ``FEED_CACHE_TIMEOUT`` seconds.
+    """
+    key = f'feed:pull-authors:{user.pk}:{user_generation}'
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = list(
+            user.following.filter(followers_count__gte=settings.FEED_PULL_FOLLOWER_THRESHOLD)
+            .order_by('id').values_list('id', flat=True)
+        )
+        cache.set(key, author_ids, timeout=settings.FEED_CACHE_TIMEOUT)
+    return author_ids
+
+
+def get_generations(user):
+    """
+    Return the user's own generation and a digest of the generations of the
+    pull authors they follow, so one of those posting only invalidates its
+    own followers' pages.
+    """
+    user_generation = cache.get(generation_key(user.pk), '')
+    keys = [author_generation_key(author_id) for author_id in followed_pull_authors(user, user_generation)]
+    if not keys:
+        return user_generation, ''
+    generations = cache.get_many(keys)
+    digest = hashlib.sha1(':'.join(generations.get(key, '') for key in keys).encode()).hexdigest()
+    return user_generation, digest
+
+
+class FeedPageCache:
+    """
+    Caches the serialized first ``FEED_CACHE_PAGES`` pages of a user's feed
+    for ``FEED_CACHE_TIMEOUT`` seconds.
+
+    Keys include the user's generation and those of the pull authors they
+    follow, so bumping any of them makes old pages unreachable. A page is
+    cacheable if it is the first page, or if its cursor was handed out as
+    ``next`` by a cached page less than ``FEED_CACHE_PAGES`` deep.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        params = request.query_params
+        self.generations = get_generations(request.user)
+        self.variant = (
+            params.get('mode', ''), params.get('page_size', ''),
+            params.get('fields', ''), params.get('expand', ''),
+        )
+        self.cursor = params.get('cursor', '')
+        self.depth = 1 if not self.cursor else cache.get(self.depth_key(self.cursor))
+
+    def make_key(self, kind, cursor):
+        user_generation, pull_generation = self.generations
+        mode, page_size, fields, expand = self.variant
+        return (
+            f'feed:{kind}:{self.request.user.pk}:{user_generation}:{pull_generation}'
+            f':{mode}:{page_size}:{fields}:{expand}:{cursor}'
+        )
+
+    def page_key(self):
+        return self.make_key('page', self.cursor)
+
+    def depth_key(self, cursor):
+        return self.make_key('depth', cursor)
+
+    @property
+    def cacheable(self):
+        return self.depth is not None and self.depth <= settings.FEED_CACHE_PAGES
+
+    def get(self):
+        if not self.cacheable:
+            return None
+        data = cache.get(self.page_key())
+        record_lookup(hit=data is not None)
+        return data
+
+    def set(self, data):
+        if not self.cacheable:
+            return
+        timeout = settings.FEED_CACHE_TIMEOUT
+        values = {self.page_key(): data}
+        if data.get('next') and self.depth < settings.FEED_CACHE_PAGES:
+            next_cursor = parse_qs(urlparse(data['next']).query).get('cursor', [''])[0]
+            values[self.depth_key(next_cursor)] = self.depth + 1
+        cache.set_many(values, timeout=timeout)
+
+
+def record_lookup(hit):
+    key = HITS_KEY if hit else MISSES_KEY
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_cache_stats():
+    """Return feed cache hit/miss counters since they were last reset."""
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+    }
+
+
+def reset_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,115 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(request, param):
+    """Return the comma-separated names in ``?<param>=``, or None if it is absent."""
+    query_params = getattr(request, 'query_params', None)
+    if query_params is None or param not in query_params:
+        return None
+    return [name.strip() for name in query_params[param].split(',') if name.strip()]
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=`` and ``?expand=`` for a ``ModelSerializer``.
+
+    Fields named in ``Meta.expandable_fields`` (typically to-many relations)
+    are left out unless the client passes ``?expand=<name>``, and
+    ``?fields=a,b`` keeps only the fields named. Both only apply to the
+    top-level serializer of a GET, so writes and nested serializers keep
+    their usual shape.
+
+    ``get_query_plan`` turns the fields that are left into the arguments
+    for ``only()``, ``select_related()`` and ``prefetch_related()``, so
+    columns and relations nobody asked for are not loaded at all. Method
+    fields name the columns they read in ``Meta.field_sources``.
+    """
+
+    def is_sparse_root(self):
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return False
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        if not self.is_sparse_root():
+            for name in expandable:
+                fields.pop(name, None)
+            return fields
+
+        request = self.context['request']
+        expand = parse_names(request, 'expand') or []
+        unknown = [name for name in expand if name not in expandable]
+        if unknown:
+            raise ValidationError({'expand': f"Cannot expand: {', '.join(unknown)}."})
+        for name in expandable:
+            if name not in expand:
+                fields.pop(name, None)
+
+        requested = parse_names(request, 'fields')
+        if requested:
+            unknown = [name for name in requested if name not in fields]
+            if unknown:
+                raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}."})
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+    def get_query_plan(self, prefix=''):
+        """
+        Return ``(only, select_related, prefetch_related)`` lists that load
+        exactly what ``self.fields`` render. ``prefix`` is the lookup path of
+        a nested serializer, e.g. ``'actor__'``.
+        """
+        opts = self.Meta.model._meta
+        only, select, prefetch = {prefix + opts.pk.name}, [], []
+        field_sources = getattr(self.Meta, 'field_sources', {})
+
+        for name, field in self.fields.items():
+            if name in field_sources:
+                sources = field_sources[name]
+            elif field.source == '*':
+                sources = []
+            else:
+                sources = [field.source.replace('.', '__')]
+
+            for source in sources:
+                relation, _, rest = source.partition('__')
+                try:
+                    model_field = opts.get_field(relation)
+                except FieldDoesNotExist:
+                    # Annotations such as search_snippet.
+                    continue
+                if model_field.many_to_many or model_field.one_to_many:
+                    prefetch.append(prefix + relation)
+                    continue
+                only.add(prefix + relation)
+                if isinstance(field, SparseFieldsMixin) and not rest:
+                    select.append(prefix + relation)
+                    nested = field.get_query_plan(prefix=f'{prefix}{relation}__')
+                    only.update(nested[0])
+                    select.extend(nested[1])
+                    prefetch.extend(nested[2])
+                elif rest:
+                    select.append(prefix + relation)
+                    only.add(prefix + source)
+        return sorted(only), list(dict.fromkeys(select)), list(dict.fromkeys(prefetch))
+
+
+def sparse_queryset(queryset, serializer, always=()):
+    """
+    Narrow ``queryset`` to what ``serializer`` renders, plus the ``always``
+    columns the view itself reads (such as the cursor's ordering fields).
+    """
+    only, select, prefetch = serializer.get_query_plan()
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset.only(*only, *always)
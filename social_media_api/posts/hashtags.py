@@ -0,0 +1,81 @@
+import re
+from django.db.models import Q
+from .models import Post, PostTag
+from .pagination import keyset_filter
+
+# A '#' not preceded by a word character, '/' or '&' (so URL fragments and
+# HTML entities such as "&#39;" are not tags), followed by letters, digits
+# or '_'.
+HASHTAG_RE = re.compile(r'(?<![\w/&])#(\w+)')
+MAX_TAG_LENGTH = PostTag._meta.get_field('tag').max_length
+
+
+def normalize_tag(tag):
+    """``#Django`` and ``django`` are the same tag."""
+    return tag.lstrip('#').lower()
+
+
+def parse_hashtags(text):
+    """Return the distinct tags in ``text``, normalized, in order of appearance."""
+    tags = (normalize_tag(match) for match in HASHTAG_RE.findall(text or ''))
+    return list(dict.fromkeys(tag for tag in tags if len(tag) <= MAX_TAG_LENGTH))
+
+
+def post_tag_rows(post):
+    return [PostTag(tag=tag, post_id=post.id, created_at=post.created_at) for tag in parse_hashtags(post.content)]
+
+
+def index_post_tags(post):
+    """
+    Bring ``post``'s rows in the tag index in line with its content.
+
+    Called when a post is created or edited; only tags that were added or
+    removed are written.
+    """
+    tags = set(parse_hashtags(post.content))
+    existing = set(PostTag.objects.filter(post_id=post.id).values_list('tag', flat=True))
+    if existing - tags:
+        PostTag.objects.filter(post_id=post.id, tag__in=existing - tags).delete()
+    PostTag.objects.bulk_create(
+        [row for row in post_tag_rows(post) if row.tag not in existing],
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_tag_index(batch_size):
+    """
+    Repopulate the tag index from every post's content and return the number
+    of rows written.
+
+    Posts are streamed ``batch_size`` at a time and their rows inserted in
+    batches, so memory stays flat however many posts there are.
+    """
+    PostTag.objects.all().delete()
+
+    count = 0
+    rows = []
+    posts = Post.objects.only('id', 'content', 'created_at').order_by()
+    for post in posts.iterator(chunk_size=batch_size):
+        rows.extend(post_tag_rows(post))
+        if len(rows) >= batch_size:
+            PostTag.objects.bulk_create(rows, ignore_conflicts=True)
+            count += len(rows)
+            rows = []
+    PostTag.objects.bulk_create(rows, ignore_conflicts=True)
+    return count + len(rows)
+
+
+def tagged_posts(tag, before=None):
+    """
+    Return the posts tagged ``tag``, newest first.
+
+    Like ``timelines.timeline_posts``, ordering on the index columns lets
+    the database walk ``(tag, created_at, post)`` rather than sort.
+    ``before`` is a ``(created_at, id)`` position; only older posts are
+    returned.
+    """
+    ordering = ('-tags__created_at', '-tags__post')
+    entries = Q(tags__tag=normalize_tag(tag))
+    if before is not None:
+        entries &= keyset_filter(ordering, before)
+    return Post.objects.filter(entries).order_by(*ordering)
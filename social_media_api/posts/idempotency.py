@@ -0,0 +1,86 @@
+import functools
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+CACHE_ALIAS = 'idempotency'
+
+
+def idempotency_cache_key(user_id, method, path, key):
+    """Keys are scoped to the user and endpoint, and hashed to a fixed length."""
+    digest = hashlib.sha256(f'{method}:{path}:{key}'.encode()).hexdigest()
+    return f'idempotency:{user_id}:{digest}'
+
+
+def request_fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def idempotent(view_method):
+    """
+    Let clients retry a view method safely by sending an ``Idempotency-Key``.
+
+    The first response for a key (anything but a 5xx) is stored in the
+    ``idempotency`` cache for ``IDEMPOTENCY_KEY_TIMEOUT`` seconds as its status and data, and is
+    replayed to retries with ``Idempotent-Replayed: true`` without running
+    the view again, so a retry writes nothing and notifies nobody. Reusing a
+    key with a different body answers 422; a retry that arrives while the
+    first request is still running answers 409. Requests without the header
+    are handled as usual.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache = caches[CACHE_ALIAS]
+        cache_key = idempotency_cache_key(request.user.pk, request.method, request.path, key)
+        fingerprint = request_fingerprint(request)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return replay(stored, fingerprint)
+
+        lock_key = f'{cache_key}:lock'
+        if not cache.add(lock_key, 1, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return Response(
+                {"detail": f"A request with this {HEADER} is still in progress."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, timeout=settings.IDEMPOTENCY_KEY_TIMEOUT)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
+
+
+def replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response(
+            {"detail": f"This {HEADER} was already used with a different request body."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(stored['data'], status=stored['status'], headers={REPLAYED_HEADER: 'true'})
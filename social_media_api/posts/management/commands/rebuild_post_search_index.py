@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+from posts.search import rebuild_search_index, search_index_available
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 full-text index used by post search."
+
+    def handle(self, *args, **options):
+        if not search_index_available():
+            raise CommandError("The full-text index only exists on SQLite; run migrate first.")
+
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} posts."))
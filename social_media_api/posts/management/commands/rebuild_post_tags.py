@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from posts.hashtags import rebuild_tag_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hashtag index used by /api/tags/<tag>/ from post content."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Posts read and tag rows written per batch.",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_tag_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} hashtags."))
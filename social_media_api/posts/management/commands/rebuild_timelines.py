@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from accounts.models import CustomUser
+from posts.models import TimelineEntry
+from posts.timelines import backfill_timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's materialized feed timeline from their follows."
+
+    def handle(self, *args, **options):
+        Follow = CustomUser.following.through
+        follows = Follow.objects.select_related('from_customuser', 'to_customuser')
+
+        TimelineEntry.objects.all().delete()
+
+        count = 0
+        for follow in follows.iterator(chunk_size=1000):
+            backfill_timeline(follow.from_customuser, follow.to_customuser)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt timelines for {count} follows."))
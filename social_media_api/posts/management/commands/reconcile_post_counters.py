@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from accounts.models import CustomUser, followers_recount
+from posts.cache import invalidate_posts
+from posts.counters import like_total_cache_key
+from posts.models import Post, Like, Comment, LikeCounterShard
+from posts.ranking import update_scores
+
+
+def count_per_post(model, ids):
+    return dict(
+        model.objects.filter(post_id__in=ids)
+        .values('post').annotate(n=Count('*')).values_list('post', 'n')
+    )
+
+
+def recount(model):
+    counts = model.objects.filter(post=OuterRef('pk')).values('post').annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def shard_sum():
+    sums = (
+        LikeCounterShard.objects.filter(post=OuterRef('pk'))
+        .values('post').annotate(n=Sum('count')).values('n')
+    )
+    return Coalesce(Subquery(sums, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Post.like_count, Post.comment_count and CustomUser.followers_count "
+        "and fix any drift, refreshing the scores of fixed and sharded posts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Number of posts checked per chunk (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = fixed = 0
+
+        while True:
+            # Walk posts by primary key so each chunk is an index range scan.
+            posts = list(
+                Post.objects.filter(id__gt=last_id).order_by('id')
+                .annotate(like_total=F('like_count') + shard_sum())
+                .values_list('id', 'like_total', 'comment_count')[:batch_size]
+            )
+            if not posts:
+                break
+            last_id = posts[-1][0]
+            ids = [post_id for post_id, _, _ in posts]
+
+            likes = count_per_post(Like, ids)
+            comments = count_per_post(Comment, ids)
+            drifted = [
+                post_id for post_id, like_count, comment_count in posts
+                if (like_count, comment_count) != (likes.get(post_id, 0), comments.get(post_id, 0))
+            ]
+
+            # Recount inside the UPDATE itself so likes or comments written
+            # since the check above are not overwritten. Drifted sharded
+            # posts have their shards folded into like_count, which could
+            # otherwise go negative when the shards over-count.
+            if drifted:
+                with transaction.atomic():
+                    Post.objects.filter(id__in=drifted).update(
+                        like_count=recount(Like),
+                        comment_count=recount(Comment),
+                    )
+                    LikeCounterShard.objects.filter(post_id__in=drifted).update(count=0)
+                cache.delete_many([like_total_cache_key(post_id) for post_id in drifted])
+                invalidate_posts(drifted)
+
+            # Sharded posts' scores are refreshed at most every
+            # FEED_TOP_SHARDED_REFRESH_SECONDS, so bring them up to date too.
+            update_scores(list(
+                Post.objects.filter(Q(id__in=drifted) | Q(id__in=ids, like_shards__gt=0))
+                .only('id', 'created_at', 'like_shards')
+            ))
+
+            checked += len(posts)
+            fixed += len(drifted)
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} posts, fixed {fixed}."))
+        checked, fixed = self.reconcile_followers(batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} users, fixed {fixed}."))
+
+    def reconcile_followers(self, batch_size):
+        """Fix drifted followers_count, which decides whether an author's posts are pushed or pulled."""
+        Follow = CustomUser.following.through
+        last_id = 0
+        checked = fixed = 0
+
+        while True:
+            users = list(
+                CustomUser.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'followers_count')[:batch_size]
+            )
+            if not users:
+                break
+            last_id = users[-1][0]
+            ids = [user_id for user_id, _ in users]
+
+            followers = dict(
+                Follow.objects.filter(to_customuser_id__in=ids)
+                .values('to_customuser').annotate(n=Count('*')).values_list('to_customuser', 'n')
+            )
+            drifted = [user_id for user_id, count in users if count != followers.get(user_id, 0)]
+            if drifted:
+                CustomUser.objects.filter(id__in=drifted).update(followers_count=followers_recount())
+
+            checked += len(users)
+            fixed += len(drifted)
+
+        return checked, fixed
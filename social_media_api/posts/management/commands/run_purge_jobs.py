@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from posts.purge import run_purge_jobs
+
+
+class Command(BaseCommand):
+    help = "Purge soft-deleted posts and accounts queued as PurgeJobs, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new jobs instead of exiting once none are left.",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help="Seconds to wait between polls with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_purge_jobs()
+            if count:
+                self.stdout.write(f"Finished {count} purge jobs.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("No purge jobs left."))
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from posts.tasks import run_timeline_tasks
+
+
+class Command(BaseCommand):
+    help = "Run pending timeline backfills and purges queued by follow/unfollow."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new tasks instead of exiting once the queue is empty.",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help="Seconds to wait between polls with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_timeline_tasks()
+            if count:
+                self.stdout.write(f"Ran {count} timeline tasks.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("Timeline task queue is empty."))
@@ -0,0 +1,40 @@
+import re
+from django.conf import settings
+from accounts.models import CustomUser
+from notifications.utils import create_notifications
+
+# '@' not preceded by a word character, '/' or '@' (so email addresses and
+# URLs are skipped), then a username. Usernames may contain '.', '+' and '-'
+# but a mention never ends on one, so "thanks @bob." names "bob".
+MENTION_RE = re.compile(r'(?<![\w/@])@(\w(?:[\w.+-]*\w)?)')
+MENTION_VERB = "mentioned you in a post"
+
+
+def parse_mentions(text, limit=None):
+    """Return the distinct usernames mentioned in ``text``, in order, at most ``limit``."""
+    usernames = list(dict.fromkeys(MENTION_RE.findall(text or '')))
+    return usernames if limit is None else usernames[:limit]
+
+
+def notify_mentions(post, previous_content=None):
+    """
+    Notify the users ``post`` mentions, with one lookup and one insert.
+
+    Usernames are deduplicated and capped at ``POST_MENTION_LIMIT``, then
+    resolved with a single ``username__in`` query; unknown names, inactive
+    accounts and the author are skipped. When a post is edited, pass its
+    old content so only newly added mentions are notified.
+    """
+    usernames = parse_mentions(post.content, settings.POST_MENTION_LIMIT)
+    if previous_content is not None:
+        already_mentioned = set(parse_mentions(previous_content, settings.POST_MENTION_LIMIT))
+        usernames = [username for username in usernames if username not in already_mentioned]
+    if not usernames:
+        return []
+
+    recipients = CustomUser.objects.filter(username__in=usernames, is_active=True).exclude(pk=post.author_id)
+    return create_notifications(
+        actor=post.author,
+        verb=MENTION_VERB,
+        notifications=[(recipient, post) for recipient in recipients],
+    )
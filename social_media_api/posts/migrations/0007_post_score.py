@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:06
+
+import datetime
+import math
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+# Frozen copies of the ranking parameters as of this migration, so replaying
+# it later gives the same scores whatever the settings say by then.
+RANKING_EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+FEED_TOP_DECAY_SECONDS = 45000
+FEED_TOP_COMMENT_WEIGHT = 2
+
+
+def populate_scores(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    LikeCounterShard = apps.get_model('posts', 'LikeCounterShard')
+    shard_sums = dict(
+        LikeCounterShard.objects.values('post').annotate(total=Sum('count')).values_list('post', 'total')
+    )
+
+    posts = list(Post.objects.only('id', 'created_at', 'like_count', 'comment_count'))
+    for post in posts:
+        likes = post.like_count + (shard_sums.get(post.id) or 0)
+        engagement = likes + post.comment_count * FEED_TOP_COMMENT_WEIGHT
+        age = (post.created_at - RANKING_EPOCH).total_seconds() / FEED_TOP_DECAY_SECONDS
+        post.score = math.log10(max(engagement, 1)) + age
+    Post.objects.bulk_update(posts, ['score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_likecountershard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-score', '-id'], name='post_score_idx'),
+        ),
+        migrations.RunPython(populate_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:10
+
+from django.db import migrations
+
+# FTS5 index over posts, kept in sync by triggers so that bulk and raw
+# writes are indexed too. rowid is the post id.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        title, content, author_username,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts (rowid, title, content, author_username)
+        SELECT new.id, new.title, new.content, username
+        FROM accounts_customuser WHERE id = new.author_id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF title, content, author_id ON posts_post BEGIN
+        DELETE FROM posts_post_fts WHERE rowid = old.id;
+        INSERT INTO posts_post_fts (rowid, title, content, author_username)
+        SELECT new.id, new.title, new.content, username
+        FROM accounts_customuser WHERE id = new.author_id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_post_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_username AFTER UPDATE OF username ON accounts_customuser BEGIN
+        UPDATE posts_post_fts SET author_username = new.username
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO posts_post_fts (rowid, title, content, author_username)
+    SELECT posts_post.id, posts_post.title, posts_post.content, accounts_customuser.username
+    FROM posts_post JOIN accounts_customuser ON accounts_customuser.id = posts_post.author_id
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_username",
+    "DROP TRIGGER IF EXISTS posts_post_fts_delete",
+    "DROP TRIGGER IF EXISTS posts_post_fts_update",
+    "DROP TRIGGER IF EXISTS posts_post_fts_insert",
+    "DROP TABLE IF EXISTS posts_post_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases keep using SearchFilter's LIKE queries.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_customuser_followers_count'),
+        ('posts', '0007_post_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
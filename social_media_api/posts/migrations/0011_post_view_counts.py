@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:22
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Adding columns makes SQLite rebuild posts_post, which would drop the search
+# index triggers (and fail on the one that reads posts_post), so the index is
+# dropped first and rebuilt afterwards.
+search_index = import_module('posts.migrations.0008_post_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_trendingsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(search_index.drop_search_index, search_index.create_search_index),
+        migrations.AddField(
+            model_name='post',
+            name='unique_viewers',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='viewers_sketch',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(search_index.create_search_index, search_index.drop_search_index),
+    ]
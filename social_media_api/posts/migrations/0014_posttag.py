@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:42
+
+import re
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of posts.hashtags as of this migration, so replaying it later
+# indexes the same tags whatever that module or the models say by then.
+HASHTAG_RE = re.compile(r'(?<![\w/&])#(\w+)')
+MAX_TAG_LENGTH = 100
+
+
+def parse_hashtags(text):
+    tags = (match.lower() for match in HASHTAG_RE.findall(text or ''))
+    return list(dict.fromkeys(tag for tag in tags if len(tag) <= MAX_TAG_LENGTH))
+
+
+def index_existing_posts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostTag = apps.get_model('posts', 'PostTag')
+    rows = []
+    for post in Post.objects.filter(deleted_at__isnull=True).only('id', 'content', 'created_at').iterator(chunk_size=1000):
+        rows.extend(
+            PostTag(tag=tag, post_id=post.id, created_at=post.created_at) for tag in parse_hashtags(post.content)
+        )
+        if len(rows) >= 1000:
+            PostTag.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    PostTag.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_soft_delete_purge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', '-created_at', '-post'], name='posttag_tag_recent_idx')],
+                'unique_together': {('tag', 'post')},
+            },
+        ),
+        migrations.RunPython(index_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:09
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+# Adding the column makes SQLite rebuild posts_post; see 0011.
+search_index = import_module('posts.migrations.0008_post_search_index')
+
+
+def mark_pulled_posts(apps, schema_editor):
+    """
+    Posts that were never pushed to any timeline are read at feed time.
+    Marking a pushed post as pulled only makes feeds read it twice (they
+    drop duplicates), so this errs that way rather than consulting settings.
+    """
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    Post.objects.exclude(Exists(TimelineEntry.objects.filter(post=OuterRef('pk')))).update(fanned_out=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_posttag'),
+    ]
+
+    operations = [
+        migrations.RunPython(search_index.drop_search_index, search_index.create_search_index),
+        migrations.AddField(
+            model_name='post',
+            name='fanned_out',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(search_index.create_search_index, search_index.drop_search_index),
+        migrations.RunPython(mark_pulled_posts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['author', '-created_at', '-id'], name='post_pulled_recent_idx'),
+        ),
+    ]
@@ -1,12 +1,51 @@
 from django.db import models
 
 # Create your models here.
+class PostManager(models.Manager):
+    """Hides soft-deleted posts; ``Post.all_objects`` still sees them."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Post(models.Model):
     author = models.ForeignKey('accounts.CustomUser', on_delete=models.CASCADE, related_name='posts')
     title = models.CharField(max_length=255)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized totals, kept in step by posts.counters.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    # Number of LikeCounterShard rows likes are spread over; 0 means unsharded.
+    like_shards = models.PositiveSmallIntegerField(default=0)
+    # Time-decayed ranking score for the "top" feed, see posts.ranking.
+    score = models.FloatField(default=0)
+    # Views, flushed in batches by posts.viewcounts. unique_viewers is the
+    # estimate of the HyperLogLog registers stored in viewers_sketch.
+    view_count = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    viewers_sketch = models.BinaryField(default=b'')
+    # Set when the post is deleted; the row and its dependents are removed
+    # later by a PurgeJob.
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # False when the author was a pull author at write time, so the post was
+    # never pushed to timelines and is merged into feeds at read time.
+    fanned_out = models.BooleanField(default=True)
+
+    objects = PostManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_recent_idx'),
+            models.Index(fields=['-score', '-id'], name='post_score_idx'),
+            # Only the posts feeds pull, so reading them never walks pushed ones.
+            models.Index(
+                fields=['author', '-created_at', '-id'], name='post_pulled_recent_idx',
+                condition=models.Q(fanned_out=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -18,6 +57,12 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Serves comment pages and previews: WHERE post_id = ? ORDER BY created_at, id.
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
     
@@ -31,4 +76,142 @@ class Like(models.Model):
         unique_together = ('post', 'user')
 
     def __str__(self):
-        return f'Liked by {self.user.username} on {self.post.title}'
\ No newline at end of file
+        return f'Liked by {self.user.username} on {self.post.title}'
+
+
+class LikeCounterShard(models.Model):
+    """
+    One slice of a hot post's like total.
+
+    Once a post is sharded, each like or unlike updates a random shard so
+    concurrent writers do not all contend for the ``Post`` row. The total is
+    ``Post.like_count`` plus the sum of the shards; ``count`` may go negative
+    when an unlike lands on a different shard than its like.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='like_counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post', 'shard')
+
+    def __str__(self):
+        return f'Like shard {self.shard} of {self.post.title}'
+
+
+class TimelineEntry(models.Model):
+    """
+    A post materialized into a follower's feed.
+
+    Rows are written when a post is created (fan-out on write) so the feed
+    can be read back with a single range scan over ``(user, created_at)``.
+    ``author`` and ``created_at`` are copied from the post so follow/unfollow
+    and ordering never need to join ``Post``.
+    """
+    user = models.ForeignKey('accounts.CustomUser', on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey('accounts.CustomUser', on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_recent_idx'),
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post.title} in {self.user.username}\'s timeline'
+
+
+class PostTag(models.Model):
+    """
+    One hashtag of a post, the inverted index behind ``/api/tags/<tag>/``.
+
+    Rows are written from the post's content when it is created or edited
+    (see ``posts.hashtags``). ``created_at`` is copied from the post so a tag
+    page is a single range scan over ``(tag, created_at, post)``.
+    """
+    tag = models.CharField(max_length=100)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='tags')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('tag', 'post')
+        indexes = [
+            models.Index(fields=['tag', '-created_at', '-post'], name='posttag_tag_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.tag} on {self.post.title}'
+
+
+class TimelineTask(models.Model):
+    """
+    A pending backfill or purge of one author's posts in a user's timeline.
+
+    Follow and unfollow only record a task; ``posts.tasks`` works through
+    them in chunks of ``TIMELINE_TASK_CHUNK_SIZE`` posts, saving its position
+    after each chunk. There is at most one task per ``(user, author)``, and
+    a new one replaces any still pending, so following and unfollowing in
+    quick succession leaves only the latest action to run.
+    """
+    BACKFILL = 'backfill'
+    PURGE = 'purge'
+    ACTION_CHOICES = [(BACKFILL, 'Backfill'), (PURGE, 'Purge')]
+
+    user = models.ForeignKey('accounts.CustomUser', on_delete=models.CASCADE, related_name='timeline_tasks')
+    author = models.ForeignKey('accounts.CustomUser', on_delete=models.CASCADE, related_name='+')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # Keyset position of the last post copied by a backfill, and how many
+    # posts it has copied so far.
+    position_created_at = models.DateTimeField(null=True, blank=True)
+    position_post_id = models.BigIntegerField(null=True, blank=True)
+    copied = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'author')
+
+    def __str__(self):
+        return f'{self.action} {self.author.username} for {self.user.username}'
+
+
+class TrendingSnapshot(models.Model):
+    """State of ``posts.trending.TrendingTracker`` as JSON, saved periodically."""
+    name = models.CharField(max_length=50, unique=True)
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Trending snapshot {self.name} at {self.updated_at}'
+
+
+class PurgeJob(models.Model):
+    """
+    Background removal of a soft-deleted post or user and everything that
+    depends on it.
+
+    ``posts.purge`` deletes dependents in batches of ``PURGE_BATCH_SIZE``
+    rows, one short transaction each, instead of letting the CASCADE
+    collector load them all in the deleting request. ``stage`` and
+    ``deleted`` report progress; ``finished_at`` is set once the target row
+    itself is gone.
+    """
+    POST = 'post'
+    USER = 'user'
+    KIND_CHOICES = [(POST, 'Post'), (USER, 'User')]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    target_id = models.BigIntegerField()
+    requested_by = models.ForeignKey(
+        'accounts.CustomUser', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    stage = models.CharField(max_length=20, blank=True)
+    deleted = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Purge {self.kind} {self.target_id}'
@@ -0,0 +1,205 @@
+import base64
+import datetime
+import json
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(position):
+    """Encode a keyset position (e.g. ``(created_at, id)``) as an opaque token."""
+    # Datetimes keep full microsecond precision so no row is skipped or repeated.
+    position = [
+        value.isoformat() if isinstance(value, datetime.datetime) else value
+        for value in position
+    ]
+    data = json.dumps(position, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def parse_datetime(value):
+    value = datetime.datetime.fromisoformat(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+# How each field a cursor can be ordered on is parsed back from JSON.
+CURSOR_FIELD_PARSERS = {
+    'created_at': parse_datetime,
+    'updated_at': parse_datetime,
+    'score': float,
+    'search_rank': float,
+    'id': int,
+}
+
+
+def decode_cursor(cursor, ordering=('created_at', 'id')):
+    """
+    Decode a token produced by ``encode_cursor`` into a position in
+    ``ordering``; raise NotFound if it is malformed or of the wrong types.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        raise NotFound("Invalid cursor.")
+    if not isinstance(position, list) or len(position) != len(ordering):
+        raise NotFound("Invalid cursor.")
+    try:
+        return tuple(
+            CURSOR_FIELD_PARSERS.get(field.lstrip('-'), lambda value: value)(value)
+            for field, value in zip(ordering, position)
+        )
+    except (TypeError, ValueError):
+        raise NotFound("Invalid cursor.")
+
+
+def keyset_filter(ordering, position):
+    """
+    Return a Q that selects the rows after ``position`` in ``ordering``.
+
+    ``ordering`` is a ``(field, tiebreaker)`` pair sorted in the same
+    direction, so ``(a, b) < (x, y)`` becomes ``a < x OR (a = x AND b < y)``,
+    which the database answers with an index seek instead of an OFFSET scan.
+    The redundant ``a <= x`` gives planners that cannot seek on an OR a
+    range to start from.
+    """
+    field, tiebreaker = ordering
+    lookup = 'lt' if field.startswith('-') else 'gt'
+    field, tiebreaker = field.lstrip('-'), tiebreaker.lstrip('-')
+    value, tiebreak_value = position
+    return Q(**{f'{field}__{lookup}e': value}) & (
+        Q(**{f'{field}__{lookup}': value})
+        | Q(**{field: value, f'{tiebreaker}__{lookup}': tiebreak_value})
+    )
+
+
+class CreatedAtCursorPagination(BasePagination):
+    """
+    Opaque cursor (keyset) pagination on ``(created_at, id)``.
+
+    Each page is fetched with a ``WHERE (created_at, id) < cursor`` seek and
+    ``LIMIT page_size + 1``, so deep pages cost the same as the first one and
+    no COUNT(*) is ever issued. Responses contain ``next`` and ``results``.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_position(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        return decode_cursor(cursor, self.ordering)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Honour an ``OrderingFilter`` on the view, with ``id`` as the tiebreaker,
+        then any filter backend that defines ``get_cursor_ordering`` (such as
+        relevance ordering for search results).
+        """
+        backends = getattr(view, 'filter_backends', [])
+        for backend in backends:
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    field = ordering[0]
+                    return (field, '-id' if field.startswith('-') else 'id')
+        for backend in backends:
+            if hasattr(backend, 'get_cursor_ordering'):
+                ordering = backend().get_cursor_ordering(request, queryset, view)
+                if ordering:
+                    return ordering
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = self.get_ordering(request, queryset, view)
+        position = self.get_position(request)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, position))
+
+        page_size = self.get_page_size(request)
+        return self.paginate_items(queryset.order_by(*self.ordering)[:page_size + 1], request)
+
+    def paginate_items(self, items, request):
+        """
+        Paginate items that are already positioned and ordered, fetched with
+        one extra item to tell whether a next page exists.
+        """
+        self.request = request
+        items = list(items)
+        page_size = self.get_page_size(request)
+        self.has_next = len(items) > page_size
+        self.page = items[:page_size]
+        return self.page
+
+    def get_item_position(self, item):
+        return tuple(getattr(item, field.lstrip('-')) for field in self.ordering)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = encode_cursor(self.get_item_position(self.page[-1]))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class FeedCursorPagination(CreatedAtCursorPagination):
+    """
+    Feed pagination. Responses also carry ``latest``, the cursor of the
+    newest post on the page, which clients pass back as ``since`` to fetch
+    only what is new.
+    """
+
+    def get_paginated_response(self, data):
+        latest = encode_cursor(self.get_item_position(self.page[0])) if self.page else None
+        return Response({
+            'latest': latest,
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['latest'] = {'type': 'string', 'nullable': True}
+        return response_schema
+
+
+class CommentCursorPagination(CreatedAtCursorPagination):
+    """Comments read top to bottom, so they are paged oldest first."""
+    ordering = ('created_at', 'id')
+
+
+class ScoreCursorPagination(CreatedAtCursorPagination):
+    """Pages the "top" feed by ``(score, id)``, highest score first."""
+    ordering = ('-score', '-id')
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Broker:
+    """
+    Publish/subscribe interface used to push new posts to live feed streams.
+
+    ``publish`` is called from synchronous request code; ``subscribe``
+    returns an async context manager yielding a ``Subscription``. Backends
+    that span processes (e.g. Redis pub/sub) implement the same two methods
+    and are selected with the ``FEED_PUBSUB_BACKEND`` setting.
+    """
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channels):
+        raise NotImplementedError
+
+
+class Subscription:
+    """Messages for one subscriber, delivered on its own event loop."""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    async def __aenter__(self):
+        self.broker.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.remove(self)
+
+    def deliver(self, message):
+        # Runs on the subscriber's loop. A slow client loses messages rather
+        # than letting its queue grow without bound.
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout=None):
+        """Return the next message, or None if ``timeout`` seconds pass first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker(Broker):
+    """
+    Delivers messages to subscribers in the current process only.
+
+    Suitable for a single ASGI worker; with several workers, posts created in
+    one process only reach streams connected to that process.
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def add(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions[channel].add(subscription)
+
+    def remove(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions[channel].discard(subscription)
+                if not self.subscriptions[channel]:
+                    del self.subscriptions[channel]
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The subscriber's loop has closed; it is about to unsubscribe.
+                pass
+
+    def subscribe(self, channels):
+        return Subscription(self, list(channels), self.maxsize)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by ``FEED_PUBSUB_BACKEND``."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.FEED_PUBSUB_BACKEND)()
+        return _broker
+
+
+def author_channel(author_id):
+    return f'posts:author:{author_id}'
@@ -0,0 +1,219 @@
+from collections import Counter
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from accounts.models import CustomUser, followers_recount
+from notifications.models import Notification
+from .cache import invalidate_author_pages, invalidate_posts
+from .counters import adjust_comment_count, adjust_like_counts
+from .feed_cache import bump_feed_generations, bump_pull_generation
+from .models import Comment, Like, LikeCounterShard, Post, PostTag, PurgeJob, TimelineEntry
+
+
+def delete_batch(queryset, size):
+    """
+    Delete up to ``size`` rows of ``queryset`` and return how many.
+
+    Only primary keys are read, so memory is bounded by ``size`` however
+    many rows match.
+    """
+    model = queryset.model
+    pks = list(queryset.values_list('pk', flat=True)[:size])
+    if pks:
+        model._base_manager.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def post_dependents(post_ids):
+    """Rows to remove before the posts themselves, in order."""
+    yield TimelineEntry.objects.filter(post_id__in=post_ids)
+    yield Like.objects.filter(post_id__in=post_ids)
+    yield Comment.objects.filter(post_id__in=post_ids)
+    yield LikeCounterShard.objects.filter(post_id__in=post_ids)
+    yield PostTag.objects.filter(post_id__in=post_ids)
+    yield Notification.objects.filter(
+        target_content_type=ContentType.objects.get_for_model(Post), target_object_id__in=post_ids
+    )
+    yield Post.all_objects.filter(pk__in=post_ids)
+
+
+def purge_posts_batch(post_ids, size):
+    """Delete the next batch of the posts' dependents, or finally the posts; 0 once they are gone."""
+    for queryset in post_dependents(post_ids):
+        deleted = delete_batch(queryset, size)
+        if deleted:
+            return deleted
+    return 0
+
+
+def purge_post_batch(post_id, size):
+    return purge_posts_batch([post_id], size)
+
+
+def purge_user_posts(user_id, size):
+    """
+    Purge the user's posts ``size`` at a time, so an account with many
+    small posts takes a handful of batches per ``size`` posts rather than
+    several per post.
+    """
+    post_ids = list(Post.all_objects.filter(author_id=user_id).order_by('id').values_list('id', flat=True)[:size])
+    return purge_posts_batch(post_ids, size) if post_ids else 0
+
+
+def purge_user_likes(user_id, size):
+    """Delete a batch of the user's likes on other posts, keeping like counts in step."""
+    likes = list(Like.objects.filter(user_id=user_id).values_list('id', 'post_id')[:size])
+    if likes:
+        Like.objects.filter(id__in=[like_id for like_id, _ in likes]).delete()
+        adjust_like_counts(list(Post.objects.filter(id__in=[post_id for _, post_id in likes])), -1)
+    return len(likes)
+
+
+def purge_user_comments(user_id, size):
+    """Delete a batch of the user's comments on other posts, keeping comment counts in step."""
+    comments = list(Comment.objects.filter(author_id=user_id).values_list('id', 'post_id')[:size])
+    if comments:
+        Comment.objects.filter(id__in=[comment_id for comment_id, _ in comments]).delete()
+        per_post = Counter(post_id for _, post_id in comments)
+        for post in Post.objects.filter(id__in=per_post):
+            adjust_comment_count(post, -per_post[post.id])
+    return len(comments)
+
+
+def purge_user_following(user_id, size):
+    """
+    Remove a batch of the user's follows and recount the followed users'
+    followers, so a count that has already drifted cannot go negative.
+    """
+    Follow = CustomUser.following.through
+    follows = list(Follow.objects.filter(from_customuser_id=user_id).values_list('id', 'to_customuser_id')[:size])
+    if follows:
+        Follow.objects.filter(id__in=[follow_id for follow_id, _ in follows]).delete()
+        CustomUser.objects.filter(id__in=[followed_id for _, followed_id in follows]).update(
+            followers_count=followers_recount()
+        )
+    return len(follows)
+
+
+USER_STAGES = [
+    ('posts', purge_user_posts),
+    ('likes', purge_user_likes),
+    ('comments', purge_user_comments),
+    ('notifications', lambda user_id, size: delete_batch(
+        Notification.objects.filter(Q(recipient_id=user_id) | Q(actor_id=user_id)), size
+    )),
+    ('timeline', lambda user_id, size: delete_batch(TimelineEntry.objects.filter(user_id=user_id), size)),
+    ('following', purge_user_following),
+    ('followers', lambda user_id, size: delete_batch(
+        CustomUser.following.through.objects.filter(to_customuser_id=user_id), size
+    )),
+    ('user', lambda user_id, size: delete_batch(CustomUser.objects.filter(pk=user_id), size)),
+]
+POST_STAGES = [('post', purge_post_batch)]
+
+
+def invalidate_feeds(entries):
+    """
+    Bump the feed generations of the users whose ``entries`` are in their
+    timelines, ``PURGE_BATCH_SIZE`` users at a time, so their cached feed
+    pages stop serving hidden posts.
+    """
+    user_ids = entries.values_list('user_id', flat=True).distinct().order_by()
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=settings.PURGE_BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) >= settings.PURGE_BATCH_SIZE:
+            bump_feed_generations(batch)
+            batch = []
+    bump_feed_generations(batch)
+
+
+def delete_post(post, requested_by=None):
+    """
+    Soft-delete ``post`` and queue a job that purges it.
+
+    The post disappears from every read path at once (``Post.objects``
+    skips it); its comments, likes and timeline entries are removed later.
+    """
+    Post.all_objects.filter(pk=post.pk).update(deleted_at=timezone.now())
+    invalidate_posts([post.pk])
+    invalidate_author_pages([post.author_id])
+    if post.fanned_out:
+        invalidate_feeds(TimelineEntry.objects.filter(post_id=post.pk))
+    else:
+        bump_pull_generation(post.author_id)
+    return enqueue_purge(PurgeJob.POST, post.pk, requested_by)
+
+
+def delete_user(user):
+    """
+    Deactivate ``user``, hide their posts and queue a job that purges them.
+
+    Their token is revoked so the account stops working immediately; the
+    follows, likes, comments and posts are removed by the job.
+    """
+    CustomUser.objects.filter(pk=user.pk).update(is_active=False)
+    Token.objects.filter(user=user).delete()
+    post_ids = Post.objects.filter(author=user).values_list('id', flat=True)
+    batch = []
+    for post_id in post_ids.iterator(chunk_size=settings.PURGE_BATCH_SIZE):
+        batch.append(post_id)
+        if len(batch) >= settings.PURGE_BATCH_SIZE:
+            invalidate_posts(batch)
+            batch = []
+    invalidate_posts(batch)
+    Post.all_objects.filter(author=user, deleted_at__isnull=True).update(deleted_at=timezone.now())
+    invalidate_author_pages([user.pk])
+    invalidate_feeds(TimelineEntry.objects.filter(author=user))
+    bump_pull_generation(user.pk)
+    return enqueue_purge(PurgeJob.USER, user.pk, user)
+
+
+def enqueue_purge(kind, target_id, requested_by=None):
+    job = PurgeJob.objects.create(kind=kind, target_id=target_id, requested_by=requested_by)
+    if settings.PURGE_JOBS_EAGER:
+        transaction.on_commit(lambda: run_purge_job(job))
+    return job
+
+
+def run_purge_job_batch(job):
+    """
+    Delete one batch for ``job`` in its own transaction and return True
+    once the job is finished.
+    """
+    stages = USER_STAGES if job.kind == PurgeJob.USER else POST_STAGES
+    names = [name for name, _ in stages]
+    index = names.index(job.stage) if job.stage in names else 0
+
+    with transaction.atomic():
+        for name, purge in stages[index:]:
+            deleted = purge(job.target_id, settings.PURGE_BATCH_SIZE)
+            if deleted:
+                job.stage = name
+                job.deleted += deleted
+                job.save(update_fields=['stage', 'deleted', 'updated_at'])
+                return False
+        job.stage = names[-1]
+        job.finished_at = timezone.now()
+        job.save(update_fields=['stage', 'finished_at', 'updated_at'])
+        return True
+
+
+def run_purge_job(job):
+    while not run_purge_job_batch(job):
+        pass
+
+
+def run_purge_jobs(max_jobs=None):
+    """Run unfinished purge jobs, oldest first, and return how many ran."""
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        job = PurgeJob.objects.filter(finished_at__isnull=True).order_by('id').first()
+        if job is None:
+            break
+        run_purge_job(job)
+        count += 1
+    return count
@@ -0,0 +1,88 @@
+import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Log
+from .models import Post, LikeCounterShard
+
+# Scores are measured from a fixed epoch so a post's age term never changes.
+RANKING_EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def age_score(created_at):
+    """
+    Return the time component of a post's score.
+
+    Rather than decaying every post's score as time passes, newer posts start
+    higher: every ``FEED_TOP_DECAY_SECONDS`` of recency is worth as much as
+    ten times the engagement. Scores therefore only change when engagement
+    does, and the ordering is the same as decaying all scores continuously.
+    """
+    return (created_at - RANKING_EPOCH).total_seconds() / settings.FEED_TOP_DECAY_SECONDS
+
+
+def engagement():
+    """SQL expression for a post's likes (including shards) plus weighted comments."""
+    shard_sum = (
+        LikeCounterShard.objects.filter(post=OuterRef('pk'))
+        .values('post').annotate(total=Sum('count')).values('total')
+    )
+    likes = F('like_count') + Coalesce(Subquery(shard_sum, output_field=IntegerField()), Value(0))
+    return likes + F('comment_count') * settings.FEED_TOP_COMMENT_WEIGHT
+
+
+def stale_score_key(post_id):
+    return f'posts:score-stale:{post_id}'
+
+
+def refresh_scores(posts):
+    """
+    Recompute ``Post.score`` for ``posts`` with a single UPDATE.
+
+    The engagement term is computed in the database from the counters the
+    caller has just written, so concurrent likes are never lost. Sharded posts
+    are hot by definition, so their score is refreshed at most once every
+    ``FEED_TOP_SHARDED_REFRESH_SECONDS`` to keep writes off the post row. A
+    skipped refresh marks the post stale, and ``refresh_stale_scores``
+    catches it up later.
+    """
+    fresh, throttled = [], []
+    for post in posts:
+        if not post.like_shards or cache.add(
+            f'posts:score-refresh:{post.pk}', True,
+            timeout=settings.FEED_TOP_SHARDED_REFRESH_SECONDS,
+        ):
+            fresh.append(post)
+        else:
+            throttled.append(post)
+    if throttled:
+        cache.set_many({stale_score_key(post.pk): True for post in throttled}, timeout=None)
+    update_scores(fresh)
+
+
+def refresh_stale_scores(posts):
+    """
+    Refresh the scores of the sharded ``posts`` whose last refresh was
+    skipped, so likes at the end of a burst still reach ``Post.score``
+    without further engagement. Posts that are not sharded cost nothing.
+    """
+    sharded = [post for post in posts if post.like_shards]
+    if not sharded:
+        return
+    stale = cache.get_many([stale_score_key(post.pk) for post in sharded])
+    refresh_scores([post for post in sharded if stale_score_key(post.pk) in stale])
+
+
+def update_scores(posts):
+    """Recompute ``Post.score`` for ``posts`` unconditionally."""
+    if not posts:
+        return
+    # Cleared before the UPDATE, so a refresh skipped while it runs stays marked.
+    cache.delete_many([stale_score_key(post.pk) for post in posts if post.like_shards])
+    age = Case(
+        *[When(pk=post.pk, then=Value(age_score(post.created_at))) for post in posts],
+        output_field=FloatField(),
+    )
+    Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+        score=Log(10, Greatest(engagement(), 1)) + age
+    )
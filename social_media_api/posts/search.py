@@ -0,0 +1,72 @@
+from django.db import connection
+from django.db.models import FloatField, TextField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+FTS_TABLE = 'posts_post_fts'
+
+# bm25 column weights for (title, content, author_username).
+RANK_SQL = f"bm25({FTS_TABLE}, 10.0, 1.0, 5.0)"
+SNIPPET_SQL = f"snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '…', 16)"
+
+
+def search_index_available():
+    """Return True if the FTS5 index exists (it is only created on SQLite)."""
+    if connection.vendor != 'sqlite':
+        return False
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def build_match_query(terms):
+    """
+    Turn search terms into an FTS5 query in which every term must match as a
+    prefix, e.g. ``['dja', 'rest']`` -> ``"dja"* "rest"*``. Terms are quoted
+    so FTS5 operators typed by users are matched literally.
+    """
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def rebuild_search_index():
+    """Repopulate the FTS5 index from ``posts_post`` and merge its segments."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(f"""
+            INSERT INTO {FTS_TABLE} (rowid, title, content, author_username)
+            SELECT posts_post.id, posts_post.title, posts_post.content, accounts_customuser.username
+            FROM posts_post JOIN accounts_customuser ON accounts_customuser.id = posts_post.author_id
+        """)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    ``?search=`` backed by the SQLite FTS5 index on posts.
+
+    Each term is matched as a prefix against the title, content and author
+    username. Results are annotated with ``search_rank`` (bm25, lower is
+    better) and a highlighted ``search_snippet``, and are paged by relevance
+    unless the client passes an explicit ``ordering``. Without the index
+    (e.g. on other databases) it falls back to ``SearchFilter``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not search_index_available():
+            return super().filter_queryset(request, queryset, view)
+
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = posts_post.id', f'{FTS_TABLE} MATCH %s'],
+            params=[build_match_query(terms)],
+        ).annotate(
+            search_rank=RawSQL(RANK_SQL, (), output_field=FloatField()),
+            search_snippet=RawSQL(SNIPPET_SQL, (), output_field=TextField()),
+        )
+
+    def get_cursor_ordering(self, request, queryset, view):
+        """Keyset ordering for ``CreatedAtCursorPagination``: best match first."""
+        if 'search_rank' in queryset.query.annotations:
+            return ('search_rank', 'id')
+        return None
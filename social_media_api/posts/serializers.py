@@ -1,12 +1,138 @@
+from django.db import models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from rest_framework import serializers
 from .models import *
+from .counters import get_like_totals
+from .fieldsets import SparseFieldsMixin
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of posts with a constant number of queries.
+
+    ``liked_by_me`` is resolved with one ``Like`` lookup over the page's post
+    IDs and like totals with one batched read, then attached to each post so
+    ``PostSerializer`` never queries per row.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        fields = self.child.fields
+        hydrate_posts(posts, self.context.get('request'), fields)
+        if self.context.get('comment_preview') and 'latest_comments' in fields:
+            attach_comment_previews(posts, self.context['comment_preview'])
+        return super().to_representation(posts)
+
+
+def hydrate_posts(posts, request=None, fields=None):
+    """
+    Attach ``like_total`` and ``liked_by_me`` to each post in ``posts``.
+
+    When ``fields`` is given, values for ``like_count`` or ``liked_by_me``
+    not in it are left as None and cost no queries.
+    """
+    if not posts:
+        return
+
+    totals = {}
+    if fields is None or 'like_count' in fields:
+        totals = get_like_totals(posts)
+    liked = set()
+    user = getattr(request, 'user', None)
+    if (fields is None or 'liked_by_me' in fields) and user is not None and user.is_authenticated:
+        liked = set(
+            Like.objects.filter(user=user, post_id__in=[post.pk for post in posts])
+            .values_list('post_id', flat=True)
+        )
+
+    for post in posts:
+        post.like_total = totals.get(post.pk)
+        post.liked_by_me = post.pk in liked
+
+
+def attach_comment_previews(posts, count):
+    """
+    Attach ``latest_comments``, the ``count`` newest comments, to each post.
+
+    One query serves the whole page: comments are numbered per post with
+    ``ROW_NUMBER() OVER (PARTITION BY post_id ORDER BY created_at DESC)``,
+    only the first ``count`` of each are kept, and their authors are joined in.
+    """
+    if not posts:
+        return
+
+    comments = (
+        Comment.objects.filter(post_id__in=[post.pk for post in posts])
+        .annotate(row_number=Window(
+            RowNumber(),
+            partition_by=[F('post_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        ))
+        .filter(row_number__lte=count)
+        .select_related('author')
+        .order_by('post_id', 'row_number')
+    )
+    previews = {post.pk: [] for post in posts}
+    for comment in comments:
+        previews[comment.post_id].append(comment)
+    for post in posts:
+        post.latest_comments = previews[post.pk]
+
+
+class CommentPreviewSerializer(serializers.ModelSerializer):
+    author_username = serializers.CharField(source='author.username', read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'author', 'author_username', 'content', 'created_at']
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    like_count = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
+    # Only present on ?search= results.
+    search_snippet = serializers.CharField(read_only=True)
+    # Only present on feed items.
+    latest_comments = CommentPreviewSerializer(many=True, read_only=True)
 
-class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
-        fields = "__all__"
+        exclude = ['like_shards', 'score', 'viewers_sketch', 'deleted_at', 'fanned_out']
+        read_only_fields = ['author', 'comment_count', 'view_count', 'unique_viewers']
+        list_serializer_class = PostListSerializer
+        field_sources = {'like_count': ['like_count', 'like_shards'], 'liked_by_me': []}
+
+    def to_representation(self, instance):
+        if not hasattr(instance, 'liked_by_me'):
+            hydrate_posts([instance], self.context.get('request'), self.fields)
+        return super().to_representation(instance)
+
+    def get_like_count(self, obj):
+        return obj.like_total
+
+    def get_liked_by_me(self, obj):
+        return obj.liked_by_me
         
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author_username = serializers.CharField(source='author.username', read_only=True)
+
     class Meta:
         model = Comment
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+        read_only_fields = ['author', 'post']
+
+
+class BulkLikeSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['like', 'unlike'])
+    post_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
+class PurgeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PurgeJob
+        fields = ['id', 'kind', 'target_id', 'stage', 'deleted', 'created_at', 'updated_at', 'finished_at']
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import comment_cache, invalidate_author_pages, post_cache
+from .models import Comment, Post
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_cached_post(sender, instance, **kwargs):
+    post_cache.invalidate([instance.pk])
+    invalidate_author_pages([instance.author_id])
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_cached_comment(sender, instance, **kwargs):
+    comment_cache.invalidate([instance.pk])
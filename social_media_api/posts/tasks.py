@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db import transaction
+from .models import TimelineTask
+from .timelines import backfill_timeline_chunk, purge_timeline_chunk
+
+
+def enqueue_timeline_task(user, author, action):
+    """
+    Schedule a backfill or purge of ``author``'s posts in ``user``'s timeline.
+
+    A task still pending for the same pair is replaced rather than updated,
+    so a worker midway through it notices that its row is gone and stops.
+    With ``TIMELINE_TASKS_EAGER`` the task runs as soon as the surrounding
+    transaction commits, which is convenient for development and tests.
+    """
+    with transaction.atomic():
+        TimelineTask.objects.filter(user=user, author=author).delete()
+        task = TimelineTask.objects.create(user=user, author=author, action=action)
+    if settings.TIMELINE_TASKS_EAGER:
+        transaction.on_commit(lambda: run_timeline_task(task))
+    return task
+
+
+def run_timeline_task_chunk(task):
+    """
+    Run one chunk of ``task`` and return True once the task is finished.
+
+    Each chunk handles at most ``TIMELINE_TASK_CHUNK_SIZE`` posts in its own
+    transaction. Backfills stop after ``TIMELINE_BACKFILL_LIMIT`` posts.
+    """
+    chunk_size = settings.TIMELINE_TASK_CHUNK_SIZE
+    with transaction.atomic():
+        if task.action == TimelineTask.PURGE:
+            done = purge_timeline_chunk(task.user, task.author, chunk_size) < chunk_size
+        else:
+            limit = min(chunk_size, settings.TIMELINE_BACKFILL_LIMIT - task.copied)
+            before = None
+            if task.position_post_id is not None:
+                before = (task.position_created_at, task.position_post_id)
+            copied, position = 0, None
+            if limit > 0:
+                copied, position = backfill_timeline_chunk(task.user, task.author, before, limit)
+            done = copied < limit or task.copied + copied >= settings.TIMELINE_BACKFILL_LIMIT
+            if not done:
+                task.position_created_at, task.position_post_id = position
+                task.copied += copied
+
+        tasks = TimelineTask.objects.filter(pk=task.pk)
+        if done:
+            tasks.delete()
+            return True
+        # Zero rows updated means the task was replaced while this chunk ran.
+        updated = tasks.update(
+            position_created_at=task.position_created_at,
+            position_post_id=task.position_post_id,
+            copied=task.copied,
+        )
+        return not updated
+
+
+def run_timeline_task(task):
+    """Run ``task`` chunk by chunk until it is finished or replaced."""
+    while not run_timeline_task_chunk(task):
+        pass
+
+
+def run_timeline_tasks(max_tasks=None):
+    """
+    Run pending timeline tasks, oldest first, and return how many ran.
+
+    Tasks are claimed by simply reading the oldest row, so run a single
+    worker; several workers would repeat each other's chunks.
+    """
+    count = 0
+    while max_tasks is None or count < max_tasks:
+        task = TimelineTask.objects.select_related('user', 'author').order_by('id').first()
+        if task is None:
+            break
+        run_timeline_task(task)
+        count += 1
+    return count
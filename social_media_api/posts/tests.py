@@ -1,3 +1,1556 @@
-from django.test import TestCase
+import asyncio
+import math
+import tempfile
+import threading
+from urllib.parse import parse_qs, urlparse
+from io import StringIO
+from asgiref.sync import sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework.authtoken.models import Token
+from accounts.models import CustomUser
+from notifications.models import Notification
+from .counters import get_like_total, promote_to_sharded
+from .models import Post, Comment, Like, PostTag, PurgeJob, TimelineEntry, TimelineTask, TrendingSnapshot
+from .tasks import run_timeline_task_chunk, run_timeline_tasks
+from .cache import post_cache
+from .hashtags import parse_hashtags, tagged_posts
+from .mentions import MENTION_VERB, notify_mentions, parse_mentions
+from .idempotency import idempotency_cache_key
+from .purge import run_purge_job_batch, run_purge_jobs
+from .ranking import age_score
+from .pagination import decode_cursor, encode_cursor, keyset_filter
+from .viewcounts import HyperLogLog, get_view_buffer
+from .trending import CountMinSketch, SlidingTopK, get_tracker, reset_tracker
+from .views import publish_post
 
-# Create your tests here.
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class UserFeedTimelineTestCase(APITestCase):
+    """Tests for the fan-out-on-write feed timelines"""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.stranger = CustomUser.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        )
+        self.reader.following.add(self.author)
+
+    def create_post(self, user, title):
+        self.client.force_authenticate(user=user)
+        response = self.client.post(reverse('post-list'), {'title': title, 'content': 'content'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Post.objects.get(pk=response.data['id'])
+
+    def get_feed_titles(self):
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(reverse('user-feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+    def test_new_post_is_pushed_to_followers(self):
+        post = self.create_post(self.author, 'Hello followers')
+        self.create_post(self.stranger, 'Not followed')
+
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+        self.assertEqual(self.get_feed_titles(), ['Hello followers'])
+
+    def test_feed_is_newest_first(self):
+        self.create_post(self.author, 'First')
+        self.create_post(self.author, 'Second')
+
+        self.assertEqual(self.get_feed_titles(), ['Second', 'First'])
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        self.create_post(self.stranger, 'Older post')
+
+        self.client.force_authenticate(user=self.reader)
+        self.client.post(reverse('follow-user', args=[self.stranger.id]))
+        self.assertEqual(run_timeline_tasks(), 1)
+        self.assertEqual(self.get_feed_titles(), ['Older post'])
+
+        self.client.post(reverse('unfollow-user', args=[self.stranger.id]))
+        self.assertEqual(run_timeline_tasks(), 1)
+        self.assertEqual(self.get_feed_titles(), [])
+
+    def test_followers_count_tracks_follow_rows(self):
+        celebrity = CustomUser.objects.create_user(
+            username='celebrity', email='celebrity@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.reader)
+        for _ in range(2):
+            self.client.post(reverse('follow-user', args=[celebrity.id]))
+        celebrity.refresh_from_db()
+        self.assertEqual(celebrity.followers_count, 1)
+
+        # A count that drifted to 0 neither fails the unfollow nor goes negative.
+        CustomUser.objects.filter(pk=celebrity.pk).update(followers_count=0)
+        for _ in range(2):
+            response = self.client.post(reverse('unfollow-user', args=[celebrity.id]))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        celebrity.refresh_from_db()
+        self.assertEqual(celebrity.followers_count, 0)
+
+        self.stranger.following.add(celebrity)
+        call_command('reconcile_post_counters', stdout=StringIO())
+        celebrity.refresh_from_db()
+        self.assertEqual(celebrity.followers_count, 1)
+
+    @override_settings(FEED_PULL_FOLLOWER_THRESHOLD=2)
+    def test_high_follower_author_is_merged_at_read_time(self):
+        celebrity = CustomUser.objects.create_user(
+            username='celebrity', email='celebrity@example.com', password='testpass123'
+        )
+        for user in (self.reader, self.stranger):
+            self.client.force_authenticate(user=user)
+            self.client.post(reverse('follow-user', args=[celebrity.id]))
+        celebrity.refresh_from_db()
+        self.assertEqual(celebrity.followers_count, 2)
+
+        self.create_post(self.author, 'Pushed first')
+        pulled = self.create_post(celebrity, 'Pulled')
+        self.create_post(self.author, 'Pushed last')
+
+        self.assertFalse(TimelineEntry.objects.filter(post=pulled).exists())
+        self.assertEqual(self.get_feed_titles(), ['Pushed last', 'Pulled', 'Pushed first'])
+
+        # The post stays pulled after the author drops below the threshold.
+        self.client.force_authenticate(user=self.stranger)
+        self.client.post(reverse('unfollow-user', args=[celebrity.id]))
+        run_timeline_tasks()
+        cache.clear()
+        self.assertEqual(self.get_feed_titles(), ['Pushed last', 'Pulled', 'Pushed first'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, TIMELINE_TASK_CHUNK_SIZE=2)
+class TimelineTaskTestCase(APITestCase):
+    """Tests for the chunked background timeline backfill and purge"""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.author)
+        for i in range(5):
+            self.client.post(reverse('post-list'), {'title': f'Post {i}', 'content': 'content'})
+        self.client.force_authenticate(user=self.reader)
+
+    def timeline_titles(self):
+        entries = TimelineEntry.objects.filter(user=self.reader).order_by('-created_at', '-post')
+        return [entry.post.title for entry in entries]
+
+    def test_follow_queues_backfill_instead_of_running_it(self):
+        self.client.post(reverse('follow-user', args=[self.author.id]))
+
+        self.assertEqual(self.timeline_titles(), [])
+        task = TimelineTask.objects.get(user=self.reader, author=self.author)
+        self.assertEqual(task.action, TimelineTask.BACKFILL)
+
+    def test_backfill_runs_in_chunks_newest_first(self):
+        self.client.post(reverse('follow-user', args=[self.author.id]))
+        task = TimelineTask.objects.get()
+
+        self.assertFalse(run_timeline_task_chunk(task))
+        self.assertEqual(self.timeline_titles(), ['Post 4', 'Post 3'])
+        self.assertFalse(run_timeline_task_chunk(task))
+        self.assertTrue(run_timeline_task_chunk(task))
+        self.assertEqual(self.timeline_titles(), ['Post 4', 'Post 3', 'Post 2', 'Post 1', 'Post 0'])
+        self.assertFalse(TimelineTask.objects.exists())
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=3)
+    def test_backfill_stops_at_limit(self):
+        self.client.post(reverse('follow-user', args=[self.author.id]))
+        run_timeline_tasks()
+        self.assertEqual(self.timeline_titles(), ['Post 4', 'Post 3', 'Post 2'])
+
+    def test_unfollow_replaces_pending_backfill(self):
+        self.client.post(reverse('follow-user', args=[self.author.id]))
+        backfill = TimelineTask.objects.get()
+        run_timeline_task_chunk(backfill)
+        self.client.post(reverse('unfollow-user', args=[self.author.id]))
+
+        # The replaced backfill stops instead of copying more posts.
+        self.assertTrue(run_timeline_task_chunk(backfill))
+        self.assertEqual(TimelineTask.objects.get().action, TimelineTask.PURGE)
+        self.assertEqual(run_timeline_tasks(), 1)
+        self.assertEqual(self.timeline_titles(), [])
+
+    def test_unfollow_hides_posts_before_purge_runs(self):
+        self.client.post(reverse('follow-user', args=[self.author.id]))
+        run_timeline_tasks()
+        self.client.post(reverse('unfollow-user', args=[self.author.id]))
+
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader).exists())
+        response = self.client.get(reverse('user-feed'))
+        self.assertEqual(response.data['results'], [])
+
+    @override_settings(TIMELINE_TASKS_EAGER=True)
+    def test_eager_tasks_run_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('follow-user', args=[self.author.id]))
+        self.assertEqual(len(self.timeline_titles()), 5)
+        self.assertFalse(TimelineTask.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CursorPaginationTestCase(APITestCase):
+    """Tests for keyset pagination of the feed, post list and comment list"""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.reader.following.add(self.author)
+
+        self.client.force_authenticate(user=self.author)
+        for i in range(5):
+            self.client.post(reverse('post-list'), {'title': f'Post {i}', 'content': 'content'})
+
+    def collect_pages(self, url):
+        titles, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [item.get('title', item.get('content')) for item in response.data['results']]
+            url = response.data['next']
+            pages += 1
+        return titles, pages
+
+    def test_post_list_pages_newest_first(self):
+        titles, pages = self.collect_pages(reverse('post-list') + '?page_size=2')
+        self.assertEqual(titles, ['Post 4', 'Post 3', 'Post 2', 'Post 1', 'Post 0'])
+        self.assertEqual(pages, 3)
+
+    def test_feed_pages_without_count_or_offset(self):
+        self.client.force_authenticate(user=self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            titles, pages = self.collect_pages(reverse('user-feed') + '?page_size=2')
+
+        self.assertEqual(titles, ['Post 4', 'Post 3', 'Post 2', 'Post 1', 'Post 0'])
+        self.assertEqual(pages, 3)
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_comments_page_oldest_first(self):
+        post = Post.objects.get(title='Post 0')
+        url = reverse('comment-list-create', args=[post.id])
+        for i in range(3):
+            self.client.post(url, {'content': f'Comment {i}'})
+
+        titles, pages = self.collect_pages(url + '?page_size=2')
+        self.assertEqual(titles, ['Comment 0', 'Comment 1', 'Comment 2'])
+        self.assertEqual(pages, 2)
+
+    def test_comment_page_uses_post_created_index(self):
+        post = Post.objects.get(title='Post 0')
+        url = reverse('comment-list-create', args=[post.id])
+        for i in range(3):
+            self.client.post(url, {'content': f'Comment {i}'})
+        first = self.client.get(url + '?page_size=2')
+        cursor = decode_cursor(parse_qs(urlparse(first.data['next']).query)['cursor'][0])
+
+        # The same queryset the comment list runs for the second page.
+        comments = (
+            Comment.objects.select_related('author').filter(post_id=post.id)
+            .filter(keyset_filter(('created_at', 'id'), cursor))
+            .order_by('created_at', 'id')[:3]
+        )
+        plan = comments.explain()
+        self.assertIn('comment_post_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_comment_page_loads_authors_in_one_query(self):
+        post = Post.objects.get(title='Post 0')
+        url = reverse('comment-list-create', args=[post.id])
+        for i in range(3):
+            self.client.post(url, {'content': f'Comment {i}'})
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual([c['author_username'] for c in response.data['results']], ['author'] * 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('post-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        urls = [
+            (reverse('post-list'), 'cursor'),
+            (reverse('user-feed'), 'cursor'),
+            (reverse('user-feed'), 'since'),
+            (reverse('author-posts', args=[self.author.id]), 'cursor'),
+            (reverse('comment-list-create', args=[Post.objects.first().id]), 'cursor'),
+        ]
+        for position in (['garbage', 1], [None, None], [{'x': 1}, 2], ['2026-01-01T00:00:00', 'zz'], [1]):
+            for url, param in urls:
+                with self.subTest(url=url, param=param, position=position):
+                    response = self.client.get(url, {param: encode_cursor(position)})
+                    self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostCountersTestCase(APITestCase):
+    """Tests for the denormalized like and comment counters"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.fan = CustomUser.objects.create_user(
+            username='fan', email='fan@example.com', password='testpass123'
+        )
+        self.post = Post.objects.create(author=self.author, title='Counted', content='content')
+        self.client.force_authenticate(user=self.fan)
+
+    def test_like_and_unlike_update_like_count(self):
+        response = self.client.post(reverse('post-like', args=[self.post.id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('post-like', args=[self.post.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        response = self.client.post(reverse('post-unlike', args=[self.post.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('post-unlike', args=[self.post.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_comment_create_and_delete_update_comment_count(self):
+        url = reverse('comment-list-create', args=[self.post.id])
+        comment_id = self.client.post(url, {'content': 'Nice'}).data['id']
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+        self.client.delete(reverse('comment-detail', args=[self.post.id, comment_id]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        Like.objects.create(post=self.post, user=self.fan)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+
+        call_command('reconcile_post_counters', batch_size=1, stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+
+    def test_reconcile_folds_overcounting_shards(self):
+        promote_to_sharded(self.post, shards=4)
+        fans = [self.fan] + [
+            CustomUser.objects.create_user(
+                username=f'fan{i}', email=f'fan{i}@example.com', password='testpass123'
+            )
+            for i in range(2)
+        ]
+        for fan in fans:
+            self.client.force_authenticate(user=fan)
+            self.client.post(reverse('post-like', args=[self.post.id]))
+        self.assertEqual(get_like_total(self.post), 3)
+        Like.objects.filter(post=self.post).exclude(user=self.fan).delete()
+
+        call_command('reconcile_post_counters', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(sum(self.post.like_counter_shards.values_list('count', flat=True)), 0)
+        self.assertEqual(get_like_total(self.post), 1)
+
+    @override_settings(LIKE_SHARD_PROMOTION_RATE=2, LIKE_COUNTER_SHARDS=4)
+    def test_hot_post_is_promoted_to_sharded_counting(self):
+        fans = [self.fan] + [
+            CustomUser.objects.create_user(
+                username=f'fan{i}', email=f'fan{i}@example.com', password='testpass123'
+            )
+            for i in range(3)
+        ]
+        for fan in fans:
+            self.client.force_authenticate(user=fan)
+            self.client.post(reverse('post-like', args=[self.post.id]))
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_shards, 4)
+        self.assertEqual(self.post.like_counter_shards.count(), 4)
+        self.assertEqual(self.post.like_count, 2)
+
+        self.client.post(reverse('post-unlike', args=[self.post.id]))
+        self.client.force_authenticate(user=self.author)
+        response = self.client.get(reverse('post-detail', args=[self.post.id]))
+        self.assertEqual(response.data['like_count'], 3)
+
+        call_command('reconcile_post_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(get_like_total(self.post), 3)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FeedHydrationTestCase(APITestCase):
+    """Tests that feed pages hydrate likes and counts in constant queries"""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.reader.following.add(self.author)
+        self.client.force_authenticate(user=self.author)
+
+    def add_posts(self, count):
+        for i in range(count):
+            self.client.post(reverse('post-list'), {'title': f'Post {i}', 'content': 'content'})
+        self.client.force_authenticate(user=self.reader)
+        for post in Post.objects.all()[::2]:
+            self.client.post(reverse('post-like', args=[post.id]))
+
+    def test_feed_reports_liked_by_me_and_counts(self):
+        self.add_posts(3)
+        response = self.client.get(reverse('user-feed'))
+
+        posts = {post['title']: post for post in response.data['results']}
+        self.assertEqual(
+            [(posts[f'Post {i}']['liked_by_me'], posts[f'Post {i}']['like_count']) for i in range(3)],
+            [(True, 1), (False, 0), (True, 1)],
+        )
+        self.assertEqual(posts['Post 0']['comment_count'], 0)
+
+    def test_feed_query_count_is_constant(self):
+        self.add_posts(2)
+        # The followed pull authors (for the cache key), timeline page,
+        # pulled authors page, the batched Like lookup and the comment
+        # previews.
+        with self.assertNumQueries(5):
+            self.client.get(reverse('user-feed'))
+
+        self.client.force_authenticate(user=self.author)
+        self.add_posts(8)
+        promote_to_sharded(Post.objects.first(), shards=4)
+        cache.clear()
+        # Plus one grouped query for the sharded totals.
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('user-feed'))
+        self.assertEqual(len(response.data['results']), 10)
+
+    @override_settings(FEED_COMMENT_PREVIEW_COUNT=2)
+    def test_feed_embeds_latest_comments(self):
+        self.add_posts(2)
+        commented, quiet = Post.objects.get(title='Post 0'), Post.objects.get(title='Post 1')
+        for i in range(3):
+            self.client.post(reverse('comment-list-create', args=[commented.id]), {'content': f'Comment {i}'})
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('user-feed'))
+        self.assertEqual(len([q for q in queries if 'ROW_NUMBER() OVER' in q['sql']]), 1)
+
+        posts = {post['id']: post for post in response.data['results']}
+        self.assertEqual(
+            [(c['content'], c['author_username']) for c in posts[commented.id]['latest_comments']],
+            [('Comment 2', 'reader'), ('Comment 1', 'reader')],
+        )
+        self.assertEqual(posts[quiet.id]['latest_comments'], [])
+        self.assertNotIn('latest_comments', self.client.get(reverse('post-list'), {'ids': commented.id}).data['results'][0])
+
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BulkLikeTestCase(APITestCase):
+    """Tests for the bulk like/unlike endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.fan = CustomUser.objects.create_user(
+            username='fan', email='fan@example.com', password='testpass123'
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, title=f'Post {i}', content='content')
+            for i in range(3)
+        ]
+        Like.objects.create(post=self.posts[0], user=self.fan)
+        Post.objects.filter(pk=self.posts[0].pk).update(like_count=1)
+        self.client.force_authenticate(user=self.fan)
+
+    def bulk(self, action, post_ids):
+        response = self.client.post(
+            reverse('post-bulk-like'), {'action': action, 'post_ids': post_ids}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item['post_id']: item['status'] for item in response.data['results']}
+
+    def test_bulk_like(self):
+        ids = [post.id for post in self.posts]
+        results = self.bulk('like', ids + [9999])
+
+        self.assertEqual(results, {
+            ids[0]: 'already_liked', ids[1]: 'liked', ids[2]: 'liked', 9999: 'not_found',
+        })
+        self.assertEqual(Like.objects.filter(user=self.fan).count(), 3)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 2)
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('like_count', flat=True)), [1, 1, 1]
+        )
+
+    def test_bulk_unlike(self):
+        ids = [post.id for post in self.posts[:2]]
+        self.assertEqual(self.bulk('unlike', ids), {ids[0]: 'unliked', ids[1]: 'not_liked'})
+        self.assertFalse(Like.objects.filter(user=self.fan).exists())
+
+    def test_bulk_like_query_count_is_constant(self):
+        more_posts = [
+            Post.objects.create(author=self.author, title=f'More {i}', content='content')
+            for i in range(10)
+        ]
+        # Posts, savepoint, existing likes, insert, counter update, score
+        # update, savepoint release and notification insert.
+        with self.assertNumQueries(8):
+            self.bulk('like', [post.id for post in more_posts])
+
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TopFeedTestCase(APITestCase):
+    """Tests for the score-ranked "top" feed mode"""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.reader.following.add(self.author)
+        self.client.force_authenticate(user=self.author)
+        for title in ('Old favourite', 'Quiet', 'Fresh'):
+            self.client.post(reverse('post-list'), {'title': title, 'content': 'content'})
+
+    def test_engagement_outranks_recency(self):
+        favourite = Post.objects.get(title='Old favourite')
+        fans = [
+            CustomUser.objects.create_user(
+                username=f'fan{i}', email=f'fan{i}@example.com', password='testpass123'
+            )
+            for i in range(2)
+        ]
+        for fan in fans:
+            self.client.force_authenticate(user=fan)
+            self.client.post(reverse('post-like', args=[favourite.id]))
+        self.client.post(reverse('comment-list-create', args=[favourite.id]), {'content': 'Great'})
+
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(reverse('user-feed') + '?mode=top&page_size=2')
+        self.assertEqual(
+            [post['title'] for post in response.data['results']], ['Old favourite', 'Fresh']
+        )
+        response = self.client.get(response.data['next'])
+        self.assertEqual([post['title'] for post in response.data['results']], ['Quiet'])
+
+    def test_age_decays_score(self):
+        posts = list(Post.objects.order_by('created_at'))
+        self.assertLess(posts[0].score, posts[-1].score)
+
+    def test_throttled_sharded_score_catches_up_on_read(self):
+        quiet = Post.objects.get(title='Quiet')
+        promote_to_sharded(quiet, shards=4)
+        for i in range(2):
+            fan = CustomUser.objects.create_user(
+                username=f'fan{i}', email=f'fan{i}@example.com', password='testpass123'
+            )
+            self.client.force_authenticate(user=fan)
+            self.client.post(reverse('post-like', args=[quiet.id]))
+        # The second like fell inside the refresh window.
+        score_after_first_like = age_score(quiet.created_at) + math.log10(1)
+        quiet.refresh_from_db()
+        self.assertAlmostEqual(quiet.score, score_after_first_like)
+
+        # The window passes with no further engagement.
+        cache.delete(f'posts:score-refresh:{quiet.id}')
+        self.client.force_authenticate(user=self.reader)
+        self.client.get(reverse('user-feed'), {'mode': 'top'})
+        quiet.refresh_from_db()
+        self.assertAlmostEqual(quiet.score, age_score(quiet.created_at) + math.log10(2))
+
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, FEED_LONG_POLL_INTERVAL=0.05)
+class FeedDeltaSyncTestCase(APITestCase):
+    """Tests for fetching only new feed posts with ?since="""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.reader.following.add(self.author)
+        self.post('Seen')
+
+    def post(self, title):
+        self.client.force_authenticate(user=self.author)
+        self.client.post(reverse('post-list'), {'title': title, 'content': 'content'})
+        self.client.force_authenticate(user=self.reader)
+
+    def test_since_returns_only_new_posts(self):
+        latest = self.client.get(reverse('user-feed')).data['latest']
+        self.post('New 1')
+        self.post('New 2')
+        self.post('New 3')
+
+        response = self.client.get(reverse('user-feed'), {'since': latest, 'page_size': 2})
+        self.assertEqual([post['title'] for post in response.data['results']], ['New 2', 'New 1'])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(reverse('user-feed'), {'since': response.data['latest']})
+        self.assertEqual([post['title'] for post in response.data['results']], ['New 3'])
+        self.assertFalse(response.data['has_more'])
+
+    def test_nothing_new_is_no_content(self):
+        latest = self.client.get(reverse('user-feed')).data['latest']
+
+        response = self.client.get(reverse('user-feed'), {'since': latest, 'wait': 0.2})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(response.content)
+
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, FEED_CACHE_PAGES=2)
+class FeedCacheTestCase(APITestCase):
+    """Tests for the versioned feed page cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.stranger = CustomUser.objects.create_user(
+            username='stranger', email='stranger@example.com', password='testpass123'
+        )
+        self.reader.following.add(self.author)
+        for i in range(5):
+            self.post(self.author, f'Post {i}')
+
+    def post(self, user, title):
+        self.client.force_authenticate(user=user)
+        self.client.post(reverse('post-list'), {'title': title, 'content': 'content'})
+        self.client.force_authenticate(user=self.reader)
+
+    def get_feed(self, url=None):
+        return self.client.get(url or reverse('user-feed'), {} if url else {'page_size': 2})
+
+    def test_repeat_loads_skip_the_database(self):
+        first = self.get_feed()
+        second = self.get_feed(first.data['next'])
+        self.assertEqual(first['X-Feed-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached = self.get_feed()
+            cached_second = self.get_feed(first.data['next'])
+        self.assertEqual(cached['X-Feed-Cache'], 'HIT')
+        self.assertEqual(cached.data, first.data)
+        self.assertEqual(cached_second.data, second.data)
+
+        # Only the first FEED_CACHE_PAGES pages are cached.
+        self.get_feed(second.data['next'])
+        self.assertEqual(self.get_feed(second.data['next'])['X-Feed-Cache'], 'MISS')
+
+    def test_new_post_invalidates(self):
+        self.get_feed()
+        self.post(self.author, 'Fresh')
+
+        response = self.get_feed()
+        self.assertEqual(response['X-Feed-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Fresh')
+
+    def test_follow_and_unfollow_invalidate(self):
+        self.post(self.stranger, 'Stranger post')
+        self.get_feed()
+
+        self.client.post(reverse('follow-user', args=[self.stranger.id]))
+        run_timeline_tasks()
+        self.assertEqual(self.get_feed().data['results'][0]['title'], 'Stranger post')
+
+        self.client.post(reverse('unfollow-user', args=[self.stranger.id]))
+        run_timeline_tasks()
+        self.assertEqual(self.get_feed().data['results'][0]['title'], 'Post 4')
+
+    @override_settings(FEED_PULL_FOLLOWER_THRESHOLD=1)
+    def test_pull_post_only_invalidates_followers(self):
+        self.get_feed()
+        self.client.force_authenticate(user=self.stranger)
+        self.get_feed()
+
+        self.post(self.author, 'Pulled')
+        self.assertEqual(self.get_feed()['X-Feed-Cache'], 'MISS')
+        self.client.force_authenticate(user=self.stranger)
+        self.assertEqual(self.get_feed()['X-Feed-Cache'], 'HIT')
+
+    def test_deleted_post_leaves_the_cached_feed(self):
+        self.assertEqual(self.get_feed().data['results'][0]['title'], 'Post 4')
+        post = Post.objects.get(title='Post 4')
+        self.client.force_authenticate(user=self.author)
+        self.client.delete(reverse('post-detail', args=[post.id]))
+        self.client.force_authenticate(user=self.reader)
+
+        response = self.get_feed()
+        self.assertEqual(response['X-Feed-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Post 3')
+
+    def test_cache_stats(self):
+        self.get_feed()
+        self.get_feed()
+        self.get_feed()
+
+        response = self.client.get(reverse('user-feed-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.reader.is_staff = True
+        self.reader.save()
+        response = self.client.get(reverse('user-feed-cache-stats'))
+        self.assertEqual(response.data, {'hits': 2, 'misses': 1, 'hit_rate': 0.6667})
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TrendingTestCase(APITestCase):
+    """Tests for the sketch-based trending posts endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        reset_tracker()
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, title=f'Post {i}', content='content')
+            for i in range(3)
+        ]
+        self.fans = [
+            CustomUser.objects.create_user(
+                username=f'fan{i}', email=f'fan{i}@example.com', password='testpass123'
+            )
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        reset_tracker()
+
+    def test_count_min_sketch_never_undercounts(self):
+        sketch = CountMinSketch(width=16, depth=4)
+        for item in range(200):
+            for _ in range(item % 5):
+                sketch.add(item)
+        for item in range(200):
+            self.assertGreaterEqual(sketch.estimate(item), item % 5)
+
+    def test_window_slides_by_bucket(self):
+        counter = SlidingTopK(window_seconds=3600, bucket_seconds=600, width=64, depth=4, capacity=10)
+        counter.add(1, 5, now=0)
+        counter.add(2, 3, now=1800)
+        self.assertEqual(counter.top(10, now=1800), [(1, 5), (2, 3)])
+        self.assertEqual(counter.top(10, now=4200), [(2, 3)])
+
+    def test_trending_ranks_likes_and_comments(self):
+        for post, fans in ((self.posts[0], self.fans[:1]), (self.posts[1], self.fans)):
+            for fan in fans:
+                self.client.force_authenticate(user=fan)
+                self.client.post(reverse('post-like', args=[post.id]))
+        self.client.post(reverse('post-bulk-like'), {'action': 'like', 'post_ids': [self.posts[2].id]}, format='json')
+        for _ in range(2):
+            self.client.post(reverse('comment-list-create', args=[self.posts[2].id]), {'content': 'Nice'})
+
+        response = self.client.get(reverse('trending'), {'window': '1h'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['post']['title'], item['count']) for item in response.data['most_liked']],
+            [('Post 1', 3), ('Post 2', 1), ('Post 0', 1)],
+        )
+        self.assertEqual(
+            [(item['post']['title'], item['count']) for item in response.data['most_commented']],
+            [('Post 2', 2)],
+        )
+        self.assertTrue(response.data['most_liked'][1]['post']['liked_by_me'])
+
+    def test_invalid_window(self):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.get(reverse('trending'), {'window': '2h'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_snapshot_survives_restart(self):
+        get_tracker().record('likes', [self.posts[0].id])
+        get_tracker().save_snapshot()
+        reset_tracker()
+
+        self.assertEqual(get_tracker().top('likes', '7d', 10), [(self.posts[0].id, 1)])
+
+    def test_unreadable_snapshot_starts_empty(self):
+        TrendingSnapshot.objects.create(name='trending', data=b'\x80\x05not json')
+        reset_tracker()
+        self.assertEqual(get_tracker().top('likes', '7d', 10), [])
+
+        self.client.force_authenticate(user=self.fans[0])
+        response = self.client.post(reverse('post-like', args=[self.posts[0].id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, POST_VIEW_FLUSH_THRESHOLD=3, POST_VIEW_FLUSH_SECONDS=3600)
+class PostViewCountTestCase(APITestCase):
+    """Tests for buffered view counts and HyperLogLog unique viewers"""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.post = Post.objects.create(author=self.author, title='Viewed', content='content')
+        self.client.force_authenticate(user=self.author)
+        self.url = reverse('post-detail', args=[self.post.id])
+
+    def tearDown(self):
+        get_view_buffer().flush()
+
+    def test_views_are_buffered_then_flushed(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE')])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+
+        self.client.get(self.url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+        self.assertEqual(self.post.unique_viewers, 1)
+        self.assertEqual(len(self.post.viewers_sketch), 1024)
+        self.assertNotIn('viewers_sketch', self.client.get(self.url).data)
+
+    def test_other_users_reads_count_as_views(self):
+        readers = [
+            CustomUser.objects.create_user(
+                username=f'reader{i}', email=f'reader{i}@example.com', password='testpass123'
+            )
+            for i in range(2)
+        ]
+        for reader in readers:
+            self.client.force_authenticate(user=reader)
+            self.client.get(reverse('post-list'), {'ids': self.post.id})
+        self.client.get(reverse('author-posts', args=[self.author.id]))
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.view_count, self.post.unique_viewers), (3, 2))
+
+    def test_hyperloglog_accuracy(self):
+        sketch = HyperLogLog(precision=10)
+        for viewer in range(20000):
+            sketch.add(viewer)
+            sketch.add(viewer)
+        # Four standard errors (4 * 3.25%) around the true count.
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.13)
+
+        small = HyperLogLog(precision=10)
+        for viewer in range(50):
+            small.add(viewer)
+        self.assertAlmostEqual(small.count(), 50, delta=2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, POST_VIEW_FLUSH_THRESHOLD=1000, POST_VIEW_FLUSH_SECONDS=3600)
+class PostMultiGetTestCase(APITestCase):
+    """Tests for fetching posts by ID list through the post cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, title=f'Post {i}', content='content')
+            for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.reader)
+
+    def tearDown(self):
+        get_view_buffer().flush()
+
+    def get_ids(self, post_ids):
+        return self.client.get(reverse('post-list'), {'ids': ','.join(map(str, post_ids))})
+
+    def test_returns_requested_posts_in_order(self):
+        post_ids = [self.posts[2].id, self.posts[0].id, 999999]
+        response = self.get_ids(post_ids)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['title'] for post in response.data['results']], ['Post 2', 'Post 0'])
+        self.assertEqual(response.data['not_found'], [999999])
+
+    def test_misses_are_one_query_and_hits_skip_posts_table(self):
+        post_ids = [post.id for post in self.posts]
+        # Post IN query + liked_by_me lookup.
+        with self.assertNumQueries(2):
+            self.get_ids(post_ids)
+        # Only the liked_by_me lookup.
+        with self.assertNumQueries(1):
+            self.get_ids(post_ids)
+
+    def test_like_invalidates_cached_post(self):
+        post = self.posts[0]
+        self.get_ids([post.id])
+        self.client.post(reverse('post-like', args=[post.id]))
+
+        result = self.get_ids([post.id]).data['results'][0]
+        self.assertEqual(result['like_count'], 1)
+        self.assertTrue(result['liked_by_me'])
+
+    @override_settings(POST_MULTI_GET_MAX=2)
+    def test_rejects_bad_or_too_many_ids(self):
+        self.assertEqual(self.get_ids(['x']).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_ids([1, 2, 3]).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, POST_VIEW_FLUSH_THRESHOLD=1000, POST_VIEW_FLUSH_SECONDS=3600)
+class ObjectCacheTestCase(APITestCase):
+    """Tests for the read-through post and comment cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.post = Post.objects.create(author=self.author, title='Cached', content='content', comment_count=1)
+        self.comment = Comment.objects.create(post=self.post, author=self.author, content='First')
+        self.client.force_authenticate(user=self.author)
+        self.post_url = reverse('post-detail', args=[self.post.id])
+        self.comment_url = reverse('comment-detail', args=[self.post.id, self.comment.id])
+
+    def tearDown(self):
+        # A flush drops the post from the cache, so none may happen mid-test.
+        get_view_buffer().flush()
+
+    def test_retrieve_reads_through_cache(self):
+        self.client.get(self.post_url)
+        # Only the liked_by_me lookup remains.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.post_url)
+        self.assertEqual(response.data['title'], 'Cached')
+
+        self.client.get(self.comment_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.comment_url)
+        self.assertEqual(response.data['content'], 'First')
+
+    def test_save_and_delete_invalidate(self):
+        self.client.get(self.post_url)
+        self.client.patch(self.post_url, {'title': 'Edited'})
+        self.assertEqual(self.client.get(self.post_url).data['title'], 'Edited')
+
+        self.client.get(self.comment_url)
+        self.client.delete(self.comment_url)
+        self.assertEqual(self.client.get(self.comment_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_missing_rows_are_cached(self):
+        url = reverse('post-detail', args=[999999])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(OBJECT_CACHE_LOCK_TIMEOUT=1, OBJECT_CACHE_LOCK_POLL_INTERVAL=0.01)
+    def test_single_recompute_per_key(self):
+        # Another request holds the recompute lock and fills the cache shortly.
+        cache.add(f'{post_cache.key(self.post.id)}:lock', 1)
+        fill = threading.Timer(0.05, cache.set, [post_cache.key(self.post.id), self.post])
+        fill.start()
+        with self.assertNumQueries(0):
+            self.assertEqual(post_cache.get(self.post.id).title, 'Cached')
+        fill.join()
+
+    def test_file_cache_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with self.settings(CACHES={'default': backend}):
+                self.client.get(self.post_url)
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.client.get(self.post_url).data['title'], 'Cached')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, PURGE_BATCH_SIZE=2)
+class PurgeTestCase(APITestCase):
+    """Tests for soft deletion and batched background purges"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.fan = CustomUser.objects.create_user(
+            username='fan', email='fan@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.fan)
+        self.client.post(reverse('follow-user', args=[self.author.id]))
+        run_timeline_tasks()
+        self.client.force_authenticate(user=self.author)
+        self.client.post(reverse('post-list'), {'title': 'Popular', 'content': 'content'})
+        self.post = Post.objects.get()
+        self.client.force_authenticate(user=self.fan)
+        self.client.post(reverse('post-like', args=[self.post.id]))
+        for i in range(3):
+            self.client.post(reverse('comment-list-create', args=[self.post.id]), {'content': f'Comment {i}'})
+
+    def test_clients_cannot_set_deleted_at(self):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(
+            reverse('post-list'), {'title': 'New', 'content': 'content', 'deleted_at': '2026-01-01T00:00:00Z'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('deleted_at', response.data)
+        self.assertTrue(Post.objects.filter(pk=response.data['id']).exists())
+
+        self.client.patch(reverse('post-detail', args=[self.post.id]), {'deleted_at': '2026-01-01T00:00:00Z'})
+        self.assertTrue(Post.objects.filter(pk=self.post.id).exists())
+
+    def test_post_is_hidden_then_purged_in_batches(self):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.delete(reverse('post-detail', args=[self.post.id]))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.id])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('post-list'), {'ids': self.post.id}).data['not_found'], [self.post.id])
+        self.assertEqual(Comment.objects.filter(post_id=self.post.id).count(), 3)
+
+        job = PurgeJob.objects.get(pk=response.data['id'])
+        self.assertFalse(run_purge_job_batch(job))
+        self.assertLessEqual(job.deleted, 2)
+        self.assertEqual(run_purge_jobs(), 1)
+
+        self.assertFalse(Post.all_objects.filter(pk=self.post.id).exists())
+        self.assertFalse(Comment.objects.filter(post_id=self.post.id).exists())
+        self.assertFalse(Like.objects.filter(post_id=self.post.id).exists())
+        self.assertFalse(TimelineEntry.objects.filter(post_id=self.post.id).exists())
+
+        progress = self.client.get(reverse('purge-job', args=[job.id])).data
+        self.assertEqual(progress['stage'], 'post')
+        # Timeline entry, like, comments, notifications for the like and the post.
+        self.assertEqual(progress['deleted'], 1 + 1 + 3 + 1 + 1)
+        self.assertIsNotNone(progress['finished_at'])
+
+    def test_comments_of_deleted_post_are_hidden(self):
+        comment = Comment.objects.filter(post=self.post).first()
+        detail = reverse('comment-detail', args=[self.post.id, comment.id])
+        self.assertEqual(self.client.get(detail).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.author)
+        self.client.delete(reverse('post-detail', args=[self.post.id]))
+        self.client.force_authenticate(user=self.fan)
+
+        self.assertEqual(self.client.get(reverse('comment-list-create', args=[self.post.id])).data['results'], [])
+        self.assertEqual(self.client.get(detail).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.patch(detail, {'content': 'Edited'}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(detail).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Comment.objects.filter(pk=comment.pk, content=comment.content).exists())
+
+    @override_settings(PURGE_BATCH_SIZE=100)
+    def test_small_posts_are_purged_together(self):
+        Post.objects.bulk_create(
+            [Post(author=self.fan, title=f'Fan post {i}', content='content') for i in range(20)]
+        )
+        self.client.delete(reverse('profile'))
+
+        job = PurgeJob.objects.get(kind=PurgeJob.USER)
+        batches = 0
+        while Post.all_objects.filter(author=self.fan).exists():
+            run_purge_job_batch(job)
+            batches += 1
+        # The posts have no dependents, so one batch deletes them all.
+        self.assertEqual(batches, 1)
+
+    def test_account_is_deactivated_then_purged(self):
+        Token.objects.create(user=self.fan)
+        other = Post.objects.create(author=self.fan, title='Fan post', content='content')
+        self.client.force_authenticate(user=self.fan)
+
+        response = self.client.delete(reverse('profile'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.fan.refresh_from_db()
+        self.assertFalse(self.fan.is_active)
+        self.assertFalse(Token.objects.filter(user=self.fan).exists())
+        self.assertFalse(Post.objects.filter(pk=other.pk).exists())
+
+        run_purge_jobs()
+        self.assertFalse(CustomUser.objects.filter(pk=self.fan.pk).exists())
+        self.assertFalse(Post.all_objects.filter(pk=other.pk).exists())
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (0, 0))
+        self.assertEqual(self.author.followers_count, 0)
+        self.assertEqual(PurgeJob.objects.get().stage, 'user')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FeedStreamTestCase(TestCase):
+    """Tests for the Server-Sent Events feed stream"""
+
+    def setUp(self):
+        self.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.reader.following.add(self.author)
+        self.token = Token.objects.create(user=self.reader)
+
+    async def test_stream_pushes_new_posts(self):
+        response = await self.async_client.get(
+            reverse('user-feed-stream'), headers={'Authorization': f'Token {self.token.key}'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        # The subscription is registered once the stream has started.
+        post = await Post.objects.acreate(author=self.author, title='Live', content='content')
+        await sync_to_async(publish_post)(post)
+
+        event = (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+        self.assertIn('event: post', event)
+        self.assertIn('"title": "Live"', event)
+        await stream.aclose()
+
+    async def test_stream_requires_token(self):
+        response = await self.async_client.get(reverse('user-feed-stream'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_requires_asgi(self):
+        response = self.client.get(reverse('user-feed-stream'))
+        self.assertEqual(response.status_code, 501)
+
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FullTextSearchTestCase(APITestCase):
+    """Tests for the FTS5-backed ?search= filter on posts"""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(
+            username='writer', email='author@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.author)
+        for title, content in [
+            ('Django tips', 'Query optimisation for Django apps'),
+            ('Cooking', 'A recipe mentioning django once'),
+            ('Gardening', 'Nothing relevant here'),
+        ]:
+            self.client.post(reverse('post-list'), {'title': title, 'content': content})
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('post-list'), {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_prefix_search_is_ranked_with_snippets(self):
+        data = self.search('djan')
+        self.assertEqual([post['title'] for post in data['results']], ['Django tips', 'Cooking'])
+        self.assertIn('<mark>django</mark>', data['results'][1]['search_snippet'])
+
+    def test_search_pages_by_rank(self):
+        data = self.search('djan', page_size=1)
+        self.assertEqual([post['title'] for post in data['results']], ['Django tips'])
+        data = self.client.get(data['next']).data
+        self.assertEqual([post['title'] for post in data['results']], ['Cooking'])
+        self.assertIsNone(data['next'])
+
+    def test_index_follows_updates_and_usernames(self):
+        post = Post.objects.get(title='Gardening')
+        self.client.patch(reverse('post-detail', args=[post.id]), {'content': 'Compost heaps'})
+        self.assertEqual([p['title'] for p in self.search('compost')['results']], ['Gardening'])
+
+        self.author.username = 'gardener'
+        self.author.save()
+        self.assertEqual(len(self.search('gardener')['results']), 3)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_post_fts')
+        call_command('rebuild_post_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('recipe')['results']), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class HashtagIndexTestCase(APITestCase):
+    """Tests for the hashtag inverted index and /api/tags/<tag>/"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(
+            username='tagger', email='tagger@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.author)
+        for i in range(3):
+            self.client.post(reverse('post-list'), {'title': f'Post {i}', 'content': f'Day {i} of #Django and #python'})
+        self.client.post(reverse('post-list'), {'title': 'Other', 'content': 'See example.com/#django &#39; #rust'})
+
+    def tag_titles(self, tag, **params):
+        response = self.client.get(reverse('tag-posts', args=[tag]), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']], response.data['next']
+
+    def test_parse_hashtags(self):
+        self.assertEqual(parse_hashtags('#Django, #django and #REST_api! a#b'), ['django', 'rest_api'])
+
+    def test_tag_pages_by_cursor(self):
+        titles, next_url = self.tag_titles('django', page_size=2)
+        self.assertEqual(titles, ['Post 2', 'Post 1'])
+        data = self.client.get(next_url).data
+        self.assertEqual([post['title'] for post in data['results']], ['Post 0'])
+        self.assertIsNone(data['next'])
+        self.assertEqual(self.tag_titles('#Rust')[0], ['Other'])
+
+    def test_tag_page_uses_index(self):
+        cursor = (Post.objects.get(title='Post 2').created_at, Post.objects.get(title='Post 2').id)
+        plan = tagged_posts('django', before=cursor)[:3].explain()
+        self.assertIn('posttag_tag_recent_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_edits_and_deletes_update_the_index(self):
+        post = Post.objects.get(title='Post 1')
+        self.client.patch(reverse('post-detail', args=[post.id]), {'content': 'Now about #rust'})
+        self.assertEqual(self.tag_titles('django')[0], ['Post 2', 'Post 0'])
+        self.assertEqual(self.tag_titles('rust')[0], ['Other', 'Post 1'])
+
+        self.client.delete(reverse('post-detail', args=[post.id]))
+        self.assertEqual(self.tag_titles('rust')[0], ['Other'])
+
+    def test_rebuild_command(self):
+        expected = sorted(PostTag.objects.values_list('tag', 'post_id', 'created_at'))
+        PostTag.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_post_tags', batch_size=2, stdout=out)
+        self.assertIn('Indexed 7 hashtags.', out.getvalue())
+        self.assertEqual(sorted(PostTag.objects.values_list('tag', 'post_id', 'created_at')), expected)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MentionTestCase(APITestCase):
+    """Tests for batched @mention notifications"""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.alice = CustomUser.objects.create_user(
+            username='alice', email='alice@example.com', password='testpass123'
+        )
+        self.bob = CustomUser.objects.create_user(
+            username='bob.smith', email='bob@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.author)
+
+    def mentioned(self):
+        return sorted(
+            Notification.objects.filter(verb=MENTION_VERB).values_list('recipient__username', flat=True)
+        )
+
+    def test_parse_mentions(self):
+        self.assertEqual(
+            parse_mentions('Hi @alice, @alice and @bob.smith. Mail me@alice.com or see x.com/@alice'),
+            ['alice', 'bob.smith'],
+        )
+
+    def test_mentions_are_notified_once(self):
+        self.client.post(reverse('post-list'), {
+            'title': 'Hello', 'content': '@alice @alice @bob.smith @ghost @author',
+        })
+        self.assertEqual(self.mentioned(), ['alice', 'bob.smith'])
+
+        post = Post.objects.get()
+        self.client.patch(reverse('post-detail', args=[post.id]), {'content': '@alice @carol'})
+        carol = CustomUser.objects.create_user(username='carol', email='carol@example.com', password='testpass123')
+        self.client.patch(reverse('post-detail', args=[post.id]), {'content': '@alice @carol again'})
+        self.assertEqual(self.mentioned(), ['alice', 'bob.smith'])
+
+        self.client.patch(reverse('post-detail', args=[post.id]), {'content': '@alice only'})
+        self.client.patch(reverse('post-detail', args=[post.id]), {'content': '@alice @carol back'})
+        self.assertEqual(self.mentioned(), ['alice', 'bob.smith', carol.username])
+
+    @override_settings(POST_MENTION_LIMIT=20)
+    def test_many_mentions_cost_constant_queries(self):
+        CustomUser.objects.bulk_create(
+            CustomUser(username=f'user{i}', email=f'user{i}@example.com') for i in range(50)
+        )
+        post = Post.objects.create(
+            author=self.author, title='Shout-out', content=' '.join(f'@user{i}' for i in range(50))
+        )
+        ContentType.objects.get_for_model(Post)
+        # One username__in lookup and one bulk insert.
+        with self.assertNumQueries(2):
+            notify_mentions(post)
+        self.assertEqual(Notification.objects.filter(verb=MENTION_VERB).count(), 20)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class IdempotencyKeyTestCase(APITestCase):
+    """Tests for replaying retried creates and likes sent with an Idempotency-Key"""
+
+    def setUp(self):
+        cache.clear()
+        caches['idempotency'].clear()
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.fan = CustomUser.objects.create_user(
+            username='fan', email='fan@example.com', password='testpass123'
+        )
+        self.post = Post.objects.create(author=self.author, title='Post', content='content')
+        self.client.force_authenticate(user=self.fan)
+
+    def test_retried_create_is_replayed(self):
+        payload = {'title': 'Once', 'content': 'content'}
+        first = self.client.post(reverse('post-list'), payload, HTTP_IDEMPOTENCY_KEY='create-1')
+        with self.assertNumQueries(0):
+            retry = self.client.post(reverse('post-list'), payload, HTTP_IDEMPOTENCY_KEY='create-1')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Post.objects.filter(title='Once').count(), 1)
+
+        other = self.client.post(reverse('post-list'), payload, HTTP_IDEMPOTENCY_KEY='create-2')
+        self.assertNotEqual(other.data['id'], first.data['id'])
+
+    def test_retried_like_and_unlike_are_replayed(self):
+        url = reverse('post-like', args=[self.post.id])
+        for _ in range(2):
+            response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='like-1')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        url = reverse('post-unlike', args=[self.post.id])
+        for _ in range(2):
+            response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='unlike-1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_key_is_scoped_and_checked(self):
+        url = reverse('post-list')
+        self.client.post(url, {'title': 'A', 'content': 'content'}, HTTP_IDEMPOTENCY_KEY='key')
+        response = self.client.post(url, {'title': 'B', 'content': 'content'}, HTTP_IDEMPOTENCY_KEY='key')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # The same key from another user is a different request.
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(url, {'title': 'B', 'content': 'content'}, HTTP_IDEMPOTENCY_KEY='key')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        lock_key = idempotency_cache_key(self.author.pk, 'POST', url, 'busy') + ':lock'
+        caches['idempotency'].add(lock_key, 1)
+        response = self.client.post(url, {'title': 'C', 'content': 'content'}, HTTP_IDEMPOTENCY_KEY='busy')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Post.objects.filter(title='C').exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, POST_VIEW_FLUSH_THRESHOLD=1000, POST_VIEW_FLUSH_SECONDS=3600)
+class AuthorPostsTestCase(APITestCase):
+    """Tests for /api/users/<id>/posts/ and its cached first page"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.viewer = CustomUser.objects.create_user(
+            username='viewer', email='viewer@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=self.author)
+        for i in range(3):
+            self.client.post(reverse('post-list'), {'title': f'Post {i}', 'content': 'content'})
+        self.url = reverse('author-posts', args=[self.author.id])
+        self.client.force_authenticate(user=self.viewer)
+
+    def tearDown(self):
+        get_view_buffer().flush()
+
+    def first_page(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_pages_by_cursor(self):
+        response = self.first_page()
+        self.assertEqual([post['title'] for post in response.data['results']], ['Post 2', 'Post 1'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([post['title'] for post in response.data['results']], ['Post 0'])
+        self.assertIsNone(response.data['next'])
+        self.assertNotIn('X-Author-Page-Cache', response)
+
+    def test_first_page_is_cached_per_author_not_per_viewer(self):
+        self.assertEqual(self.first_page()['X-Author-Page-Cache'], 'MISS')
+        Like.objects.create(post=Post.objects.get(title='Post 2'), user=self.viewer)
+        # Only the viewer's likes are looked up.
+        with self.assertNumQueries(1):
+            response = self.first_page()
+        self.assertEqual(response['X-Author-Page-Cache'], 'HIT')
+        self.assertEqual([post['liked_by_me'] for post in response.data['results']], [True, False])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_author_writes_invalidate_the_first_page(self):
+        self.first_page()
+        self.client.force_authenticate(user=self.author)
+        self.client.post(reverse('post-list'), {'title': 'Post 3', 'content': 'content'})
+        response = self.first_page()
+        self.assertEqual(response['X-Author-Page-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Post 3')
+
+        post = Post.objects.get(title='Post 3')
+        self.client.patch(reverse('post-detail', args=[post.id]), {'title': 'Edited'})
+        response = self.first_page()
+        self.assertEqual(response['X-Author-Page-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Edited')
+
+        self.client.delete(reverse('post-detail', args=[post.id]))
+        response = self.first_page()
+        self.assertEqual(response['X-Author-Page-Cache'], 'MISS')
+        self.assertEqual([p['title'] for p in response.data['results']], ['Post 2', 'Post 1'])
+
+    def test_unknown_author(self):
+        response = self.client.get(reverse('author-posts', args=[9999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_uses_author_index(self):
+        post = Post.objects.get(title='Post 2')
+        posts = (
+            Post.objects.filter(author_id=self.author.id)
+            .filter(keyset_filter(('-created_at', '-id'), (post.created_at, post.id)))
+            .order_by('-created_at', '-id')[:3]
+        )
+        plan = posts.explain()
+        self.assertIn('post_author_recent_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SparseFieldsetsTestCase(APITestCase):
+    """Tests for ?fields= / ?expand= and the queries they narrow"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='testpass123'
+        )
+        self.fans = [
+            CustomUser.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.author)
+        for i in range(2):
+            self.client.post(reverse('post-list'), {'title': f'Post {i}', 'content': 'content'})
+        self.post = Post.objects.get(title='Post 0')
+        for fan in self.fans:
+            fan.following.add(self.author)
+            self.client.force_authenticate(user=fan)
+            self.client.post(reverse('post-like', args=[self.post.id]))
+            self.client.post(reverse('comment-list-create', args=[self.post.id]), {'content': 'Nice'})
+        self.client.force_authenticate(user=self.author)
+
+    def test_post_fields_are_selected_and_only_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post-list'), {'fields': 'id,title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+        # Neither the content column nor the viewer's likes are read.
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"posts_post"."content"', queries[0]['sql'])
+
+        response = self.client.get(reverse('post-list'), {'fields': 'id,like_count'})
+        self.assertEqual(response.data['results'][1], {'id': self.post.id, 'like_count': 3})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('post-list'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('profile'), {'expand': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_ignore_fields(self):
+        response = self.client.post(reverse('post-list') + '?fields=id', {'title': 'New', 'content': 'content'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('content', response.data)
+
+    def test_follow_lists_are_only_loaded_when_expanded(self):
+        response = self.client.get(reverse('profile'))
+        self.assertNotIn('followers', response.data)
+
+        response = self.client.get(reverse('profile'), {'expand': 'followers'})
+        self.assertEqual(sorted(response.data['followers']), ['fan0', 'fan1', 'fan2'])
+        self.assertNotIn('following', response.data)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('followers-list'), {'fields': 'username'})
+        self.assertEqual(sorted(user['username'] for user in response.data), ['fan0', 'fan1', 'fan2'])
+        # One prefetch serves every follower's list.
+        with self.assertNumQueries(2):
+            self.client.get(reverse('followers-list'), {'expand': 'following'})
+
+    def test_notifications_join_actors_once(self):
+        # Three likes from three different actors.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('notification-list'))
+        self.assertEqual(len(response.data), 3)
+        self.assertNotIn('followers', response.data[0]['actor'])
+        self.assertEqual(response.data[0]['target_type'], 'post')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('notification-list'), {'fields': 'id,verb'})
+        self.assertEqual(set(response.data[0]), {'id', 'verb'})
+        self.assertNotIn('accounts_customuser', queries[0]['sql'])
+
+    def test_comments_skip_authors_unless_requested(self):
+        url = reverse('comment-list-create', args=[self.post.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,content'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'content'})
+        self.assertNotIn('accounts_customuser', queries[0]['sql'])
+
+    def test_feed_pages_are_cached_per_field_selection(self):
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user=self.fans[0], post=post, author=self.author, created_at=post.created_at)
+            for post in Post.objects.all()
+        ])
+        self.client.force_authenticate(user=self.fans[0])
+        full = self.client.get(reverse('user-feed'))
+        slim = self.client.get(reverse('user-feed'), {'fields': 'id'})
+        self.assertEqual(slim['X-Feed-Cache'], 'MISS')
+        self.assertEqual(set(slim.data['results'][0]), {'id'})
+        self.assertIn('latest_comments', full.data['results'][0])
@@ -0,0 +1,252 @@
+import heapq
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+from .feed_cache import bump_feed_generations, bump_pull_generation
+from .models import Post, TimelineEntry
+from .pagination import keyset_filter
+
+
+# Pull authors' posts are not pushed to anyone, so they mark a shared key.
+PULL_FEED_UPDATE_KEY = 'feed:updated:pull'
+
+
+def feed_update_key(user_id):
+    return f'feed:updated:{user_id}'
+
+
+def mark_feeds_updated(user_ids):
+    """
+    Record in the cache that new posts reached these users' timelines, and
+    invalidate their cached feed pages.
+    """
+    user_ids = list(user_ids)
+    stamp = time.time()
+    cache.set_many({feed_update_key(user_id): stamp for user_id in user_ids}, timeout=None)
+    bump_feed_generations(user_ids)
+
+
+def is_pull_author(author):
+    """
+    Return True if ``author``'s posts are merged into feeds at read time.
+
+    Authors with at least ``FEED_PULL_FOLLOWER_THRESHOLD`` followers are not
+    fanned out, which bounds the number of rows a single post can write.
+    """
+    return author.followers_count >= settings.FEED_PULL_FOLLOWER_THRESHOLD
+
+
+def fan_out_post(post):
+    """
+    Push a newly created post onto the timeline of every follower of its author.
+
+    Followers are streamed and written in batches of
+    ``TIMELINE_FANOUT_BATCH_SIZE`` so memory stays flat for large audiences.
+    Posts by pull authors are marked as not fanned out instead; ``feed_posts``
+    reads them directly for as long as they exist, whatever happens to the
+    author's follower count afterwards.
+    """
+    if is_pull_author(post.author):
+        Post.objects.filter(pk=post.pk).update(fanned_out=False)
+        post.fanned_out = False
+        cache.set(PULL_FEED_UPDATE_KEY, time.time(), timeout=None)
+        bump_pull_generation(post.author_id)
+        return
+
+    batch_size = settings.TIMELINE_FANOUT_BATCH_SIZE
+    follower_ids = post.author.followers.values_list('id', flat=True)
+
+    entries = []
+    for follower_id in follower_ids.iterator(chunk_size=batch_size):
+        entries.append(TimelineEntry(
+            user_id=follower_id,
+            post=post,
+            author_id=post.author_id,
+            created_at=post.created_at,
+        ))
+        if len(entries) >= batch_size:
+            TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            mark_feeds_updated(entry.user_id for entry in entries)
+            entries = []
+
+    if entries:
+        TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        mark_feeds_updated(entry.user_id for entry in entries)
+
+
+def backfill_timeline_chunk(user, author, before=None, limit=None):
+    """
+    Copy up to ``limit`` posts of ``author`` older than the ``before``
+    position into ``user``'s timeline, newest first.
+
+    Returns how many posts were copied and the ``(created_at, id)`` position
+    of the last one. Posts that were not fanned out are skipped since
+    ``pulled_posts`` serves them.
+    """
+    ordering = ('-created_at', '-id')
+    posts = Post.objects.filter(author=author, fanned_out=True)
+    if before is not None:
+        posts = posts.filter(keyset_filter(ordering, before))
+    posts = list(posts.order_by(*ordering).values_list('id', 'created_at')[:limit])
+    if not posts:
+        return 0, None
+
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user=user, post_id=post_id, author=author, created_at=created_at)
+            for post_id, created_at in posts
+        ],
+        ignore_conflicts=True,
+    )
+    mark_feeds_updated([user.pk])
+    post_id, created_at = posts[-1]
+    return len(posts), (created_at, post_id)
+
+
+def purge_timeline_chunk(user, author, limit=None):
+    """
+    Remove up to ``limit`` posts of ``author`` from ``user``'s timeline and
+    return how many were removed.
+    """
+    entries = TimelineEntry.objects.filter(user=user, author=author)
+    entry_ids = list(entries.values_list('id', flat=True)[:limit])
+    if not entry_ids:
+        return 0
+    TimelineEntry.objects.filter(id__in=entry_ids).delete()
+    bump_feed_generations([user.pk])
+    return len(entry_ids)
+
+
+def backfill_timeline(user, author):
+    """
+    Copy the most recent posts of ``author`` into ``user``'s timeline.
+
+    Only the latest ``TIMELINE_BACKFILL_LIMIT`` posts are copied; older posts
+    are rarely paged to and would make following someone expensive. Follows
+    made through the API are backfilled in chunks by ``posts.tasks``.
+    """
+    backfill_timeline_chunk(user, author, limit=settings.TIMELINE_BACKFILL_LIMIT)
+
+
+def purge_timeline(user, author):
+    """Remove every post of ``author`` from ``user``'s timeline."""
+    purge_timeline_chunk(user, author)
+
+
+def feed_ordering(fields, after=None):
+    """Newest first, or oldest first when reading forward from ``after``."""
+    if after is not None:
+        return fields
+    return tuple(f'-{field}' for field in fields)
+
+
+def timeline_posts(user, before=None, after=None):
+    """
+    Return the posts in ``user``'s timeline, newest first.
+
+    Ordering on the timeline columns lets the database walk the
+    ``(user, created_at, post)`` index instead of sorting the followed
+    authors' posts on every read. ``before`` is a ``(created_at, id)``
+    position; only posts after it in feed order are returned. With
+    ``after``, posts newer than that position are returned oldest first.
+
+    Entries of authors ``user`` no longer follows are skipped with the same
+    EXISTS probe as ``top_posts``, so an unfollow takes effect before its
+    purge task has removed them.
+    """
+    ordering = feed_ordering(('timeline_entries__created_at', 'timeline_entries__post'), after)
+    Follow = user.following.through
+    follows = Follow.objects.filter(from_customuser=user, to_customuser=OuterRef('author'))
+    entries = Q(timeline_entries__user=user) & Q(Exists(follows))
+    if before is not None or after is not None:
+        entries &= keyset_filter(ordering, after or before)
+    return Post.objects.filter(entries).order_by(*ordering)
+
+
+def pulled_posts(user, before=None, after=None):
+    """
+    Return the posts ``user``'s followed authors wrote without fanning them
+    out, newest first. Whether a post is pulled is decided when it is
+    written, so it stays in feeds if its author later drops below the
+    threshold.
+    """
+    ordering = feed_ordering(('created_at', 'id'), after)
+    posts = Post.objects.filter(author__in=user.following.all(), fanned_out=False)
+    if before is not None or after is not None:
+        posts = posts.filter(keyset_filter(ordering, after or before))
+    return posts.order_by(*ordering)
+
+
+def feed_posts(user, before=None, after=None, limit=None):
+    """
+    Return ``user``'s feed: pushed timeline posts merged with pulled posts.
+
+    Both sources are already ordered newest first (oldest first with
+    ``after``) and each is cut to ``limit`` rows, so a page is merged from at
+    most ``2 * limit`` posts without re-sorting. A post can appear in both if
+    its author crossed the threshold after it was fanned out, so duplicates
+    are dropped.
+    """
+    sources = [timeline_posts(user, before, after), pulled_posts(user, before, after)]
+    if limit is not None:
+        sources = [source[:limit] for source in sources]
+
+    merged = heapq.merge(
+        *sources,
+        key=lambda post: (post.created_at, post.id),
+        reverse=after is None,
+    )
+
+    seen = set()
+    posts = []
+    for post in merged:
+        if post.id not in seen:
+            seen.add(post.id)
+            posts.append(post)
+    return posts[:limit]
+
+
+def has_new_posts(user, after):
+    """Return True if ``user``'s feed has posts newer than ``after``."""
+    return timeline_posts(user, after=after).exists() or pulled_posts(user, after=after).exists()
+
+
+def wait_for_new_posts(user, after, timeout):
+    """
+    Block for up to ``timeout`` seconds until ``user`` has posts newer than
+    ``after``; return whether any arrived.
+
+    While waiting only the cache markers set by ``fan_out_post`` are polled,
+    every ``FEED_LONG_POLL_INTERVAL`` seconds. The database is checked again
+    only when one of them changes. The markers live in the default cache, so
+    multi-process deployments need a shared cache backend.
+    """
+    keys = [feed_update_key(user.pk), PULL_FEED_UPDATE_KEY]
+    markers = cache.get_many(keys)
+    if has_new_posts(user, after):
+        return True
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(min(settings.FEED_LONG_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        current = cache.get_many(keys)
+        if current != markers:
+            markers = current
+            if has_new_posts(user, after):
+                return True
+    return False
+
+
+def top_posts(user):
+    """
+    Return the posts of every author ``user`` follows, highest score first.
+
+    Scores are precomputed (see ``posts.ranking``). Following is checked with
+    a correlated EXISTS probe on the follow table's unique index, so the
+    database walks the ``(score, id)`` index and stops once the page is full
+    instead of collecting and sorting every followed author's posts.
+    """
+    Follow = user.following.through
+    follows = Follow.objects.filter(from_customuser=user, to_customuser=OuterRef('author'))
+    return Post.objects.filter(Exists(follows)).order_by('-score', '-id')
@@ -0,0 +1,293 @@
+import atexit
+import base64
+import json
+import random
+import sys
+import threading
+import time
+from array import array
+from django.conf import settings
+from django.db import close_old_connections
+from .models import TrendingSnapshot
+
+LIKES = 'likes'
+COMMENTS = 'comments'
+METRICS = (LIKES, COMMENTS)
+SNAPSHOT_NAME = 'trending'
+
+
+class CountMinSketch:
+    """
+    Approximate per-item counts in a fixed ``depth`` x ``width`` table.
+
+    Estimates never undercount. With ``N`` events recorded, an estimate is
+    within ``e / width * N`` of the true count with probability
+    ``1 - e ** -depth`` (about 0.27% of ``N`` with 98% confidence for the
+    default 1024 x 4). Hash functions are fixed so snapshots taken by one
+    process can be loaded by another.
+    """
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, width, depth):
+        self.width = width
+        self.depth = depth
+        rng = random.Random(depth)
+        self.hashes = [(rng.randrange(1, self.PRIME), rng.randrange(self.PRIME)) for _ in range(depth)]
+        self.counts = array('q', [0]) * (width * depth)
+
+    def indexes(self, item):
+        for row, (a, b) in enumerate(self.hashes):
+            yield row * self.width + (a * item + b) % self.PRIME % self.width
+
+    def add(self, item, count=1):
+        """Add ``count`` to ``item`` and return its new estimate."""
+        estimate = None
+        for index in self.indexes(item):
+            self.counts[index] += count
+            value = self.counts[index]
+            estimate = value if estimate is None else min(estimate, value)
+        return estimate
+
+    def estimate(self, item):
+        return min(self.counts[index] for index in self.indexes(item))
+
+
+class Bucket:
+    """Counts for one time slice: a sketch plus its heaviest items."""
+
+    def __init__(self, start, width, depth):
+        self.start = start
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates = {}
+
+    def dump(self):
+        """Return the bucket as JSON-serializable data; sketch counts are little-endian int64s."""
+        counts = array('q', self.sketch.counts)
+        if sys.byteorder == 'big':
+            counts.byteswap()
+        return {
+            'start': self.start,
+            'counts': base64.b64encode(counts.tobytes()).decode('ascii'),
+            'candidates': list(self.candidates.items()),
+        }
+
+    @classmethod
+    def restore(cls, data, width, depth):
+        """Rebuild a bucket from ``dump`` output; raises ValueError if it does not fit the layout."""
+        bucket = cls(int(data['start']), width, depth)
+        counts = array('q')
+        counts.frombytes(base64.b64decode(data['counts'], validate=True))
+        if len(counts) != width * depth:
+            raise ValueError("Sketch size does not match the layout.")
+        if sys.byteorder == 'big':
+            counts.byteswap()
+        bucket.sketch.counts = counts
+        bucket.candidates = {int(item): int(count) for item, count in data['candidates']}
+        return bucket
+
+    def add(self, item, count, capacity):
+        self.candidates[item] = self.sketch.add(item, count)
+        # Trim to ``capacity`` only once the dict has doubled, so the sort
+        # is amortized over many adds.
+        if len(self.candidates) > 2 * capacity:
+            heaviest = sorted(self.candidates.items(), key=lambda pair: pair[1], reverse=True)
+            self.candidates = dict(heaviest[:capacity])
+
+
+class SlidingTopK:
+    """
+    Approximate heavy hitters over the last ``window_seconds``.
+
+    Events go into time buckets of ``bucket_seconds``; buckets older than the
+    window are dropped, so the window slides one bucket at a time. An item's
+    count is the sum of its estimates across live buckets, and only items
+    that were among the ``capacity`` heaviest of some bucket are ranked.
+    """
+
+    def __init__(self, window_seconds, bucket_seconds, width, depth, capacity):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.buckets = []
+
+    def layout(self):
+        return [self.window_seconds, self.bucket_seconds, self.width, self.depth]
+
+    def dump(self):
+        return {'layout': self.layout(), 'buckets': [bucket.dump() for bucket in self.buckets]}
+
+    def restore(self, data):
+        """
+        Return a copy of this counter holding the buckets in ``data``, or
+        None if they were saved under a different layout.
+        """
+        if data['layout'] != self.layout():
+            return None
+        counter = SlidingTopK(self.window_seconds, self.bucket_seconds, self.width, self.depth, self.capacity)
+        counter.buckets = [Bucket.restore(bucket, self.width, self.depth) for bucket in data['buckets']]
+        return counter
+
+    def expire(self, now):
+        oldest = now - self.window_seconds
+        self.buckets = [bucket for bucket in self.buckets if bucket.start + self.bucket_seconds > oldest]
+
+    def add(self, item, count, now):
+        start = int(now // self.bucket_seconds) * self.bucket_seconds
+        if not self.buckets or self.buckets[-1].start != start:
+            self.expire(now)
+            self.buckets.append(Bucket(start, self.width, self.depth))
+        self.buckets[-1].add(item, count, self.capacity)
+
+    def top(self, k, now):
+        """Return up to ``k`` ``(item, estimated_count)`` pairs, heaviest first."""
+        self.expire(now)
+        candidates = set()
+        for bucket in self.buckets:
+            candidates.update(bucket.candidates)
+        counts = [
+            (item, sum(bucket.sketch.estimate(item) for bucket in self.buckets))
+            for item in candidates
+        ]
+        counts.sort(key=lambda pair: (-pair[1], -pair[0]))
+        return counts[:k]
+
+
+class TrendingTracker:
+    """
+    Most-liked and most-commented posts over each of ``TRENDING_WINDOWS``.
+
+    State lives in process memory and is saved to a ``TrendingSnapshot``
+    row by ``start_snapshot_thread``, off the request path, and loaded from
+    it when the process starts. Like ``InProcessBroker``, it assumes one
+    worker process; each extra worker would only count its own requests.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            (metric, window): SlidingTopK(
+                window_seconds, bucket_seconds,
+                settings.TRENDING_SKETCH_WIDTH, settings.TRENDING_SKETCH_DEPTH,
+                settings.TRENDING_CANDIDATES,
+            )
+            for metric in METRICS
+            for window, (window_seconds, bucket_seconds) in settings.TRENDING_WINDOWS.items()
+        }
+
+    def record(self, metric, post_ids, now=None):
+        """Count one ``metric`` event for each of ``post_ids``."""
+        now = time.time() if now is None else now
+        with self.lock:
+            for (counter_metric, window), counter in self.counters.items():
+                if counter_metric == metric:
+                    for post_id in post_ids:
+                        counter.add(post_id, 1, now)
+
+    def top(self, metric, window, k, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            return self.counters[metric, window].top(k, now)
+
+    def save_snapshot(self):
+        """
+        Save the counters to the snapshot row as JSON.
+
+        Each counter is dumped under the lock on its own, so ``record`` waits
+        for at most one counter rather than the whole tracker. Plain data
+        rather than pickles keeps a snapshot loadable after these classes
+        change, and loading it from never runs code.
+        """
+        counters = {}
+        for metric, window in list(self.counters):
+            with self.lock:
+                counters[f'{metric}:{window}'] = self.counters[metric, window].dump()
+        data = json.dumps(counters, separators=(',', ':')).encode()
+        TrendingSnapshot.objects.update_or_create(name=SNAPSHOT_NAME, defaults={'data': data})
+
+    def load_snapshot(self):
+        """
+        Restore counters saved by ``save_snapshot`` whose layout still
+        matches the settings. A snapshot that cannot be read is ignored, so
+        the tracker starts empty rather than failing the request.
+        """
+        snapshot = TrendingSnapshot.objects.filter(name=SNAPSHOT_NAME).first()
+        if snapshot is None:
+            return
+        try:
+            saved = json.loads(bytes(snapshot.data))
+            restored = {}
+            for (metric, window), counter in self.counters.items():
+                data = saved.get(f'{metric}:{window}')
+                restored_counter = None if data is None else counter.restore(data)
+                if restored_counter is not None:
+                    restored[metric, window] = restored_counter
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return
+        with self.lock:
+            self.counters.update(restored)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    """Return the process-wide tracker, restoring the last snapshot on first use."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = TrendingTracker()
+            _tracker.load_snapshot()
+        return _tracker
+
+
+def reset_tracker():
+    """Drop the in-memory tracker; the next ``get_tracker`` reloads the snapshot."""
+    global _tracker
+    with _tracker_lock:
+        _tracker = None
+
+
+_snapshot_thread = None
+
+
+def save_tracker_snapshot():
+    tracker = _tracker
+    if tracker is not None:
+        try:
+            tracker.save_snapshot()
+        finally:
+            close_old_connections()
+
+
+def run_snapshots():
+    while True:
+        time.sleep(settings.TRENDING_SNAPSHOT_SECONDS)
+        save_tracker_snapshot()
+
+
+def start_snapshot_thread():
+    """
+    Snapshot the tracker every ``TRENDING_SNAPSHOT_SECONDS`` in a daemon
+    thread, and once more on interpreter exit.
+
+    Called by the WSGI and ASGI entry points, so management commands and the
+    test runner never write snapshots behind the caller's back.
+    """
+    global _snapshot_thread
+    with _tracker_lock:
+        if _snapshot_thread is not None:
+            return
+        _snapshot_thread = threading.Thread(target=run_snapshots, name='trending-snapshots', daemon=True)
+        _snapshot_thread.start()
+    atexit.register(save_tracker_snapshot)
+
+
+def record_likes(post_ids):
+    get_tracker().record(LIKES, post_ids)
+
+
+def record_comment(post_id):
+    get_tracker().record(COMMENTS, [post_id])
@@ -1,6 +1,6 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import PostViewSet, CommentViewSet, UserFeedView
+from .views import AuthorPostsView, PostViewSet, CommentViewSet, UserFeedView, FeedCacheStatsView, PurgeJobView, TagPostsView, TrendingView, feed_stream
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
@@ -23,6 +23,12 @@ urlpatterns = [
         name='comment-detail'
     ),
     path('feed/', UserFeedView.as_view(), name='user-feed'),
+    path('feed/stream/', feed_stream, name='user-feed-stream'),
+    path('purge-jobs/<int:pk>/', PurgeJobView.as_view(), name='purge-job'),
+    path('users/<int:user_id>/posts/', AuthorPostsView.as_view(), name='author-posts'),
+    path('tags/<str:tag>/', TagPostsView.as_view(), name='tag-posts'),
+    path('trending/', TrendingView.as_view(), name='trending'),
+    path('feed/cache-stats/', FeedCacheStatsView.as_view(), name='user-feed-cache-stats'),
     path('posts/<int:pk>/like/', PostViewSet.as_view({'post': 'like'}), name='post-like'),
     path('posts/<int:pk>/unlike/', PostViewSet.as_view({'post': 'unlike'}), name='post-unlike'),
 ]
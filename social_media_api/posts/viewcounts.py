@@ -0,0 +1,137 @@
+import atexit
+import hashlib
+import math
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .cache import invalidate_posts
+from .models import Post
+
+
+class HyperLogLog:
+    """
+    Estimates the number of distinct items added, in ``2 ** precision`` bytes.
+
+    The relative standard error is ``1.04 / sqrt(2 ** precision)``: 3.25% at
+    the default precision of 10 (1 KiB per post), 1.63% at 12 (4 KiB).
+    Counts below ``2.5 * 2 ** precision`` use linear counting, which is
+    nearly exact for small audiences.
+    """
+
+    def __init__(self, precision, registers=b''):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if len(registers) == self.size else bytearray(self.size)
+
+    @staticmethod
+    def hash(item):
+        return int.from_bytes(hashlib.blake2b(str(item).encode(), digest_size=8).digest(), 'big')
+
+    def add(self, item):
+        value = self.hash(item)
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+class ViewBuffer:
+    """
+    Collects post views in memory and writes them out in batches.
+
+    Nothing touches the database while a view is recorded. Once
+    ``POST_VIEW_FLUSH_THRESHOLD`` views are buffered or
+    ``POST_VIEW_FLUSH_SECONDS`` have passed, the recording request flushes
+    the buffer: one ``F()`` UPDATE per distinct increment, then one read and
+    one bulk update of the viewers' HyperLogLog registers. Views buffered in
+    a process that dies without flushing are lost.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(int)
+        self.viewers = defaultdict(set)
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def record(self, post_ids, viewer_id):
+        with self.lock:
+            for post_id in post_ids:
+                self.views[post_id] += 1
+                self.viewers[post_id].add(viewer_id)
+            self.pending += len(post_ids)
+            due = (
+                self.pending >= settings.POST_VIEW_FLUSH_THRESHOLD
+                or time.monotonic() - self.last_flush >= settings.POST_VIEW_FLUSH_SECONDS
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered views to the database and return how many there were."""
+        with self.lock:
+            views, viewers, pending = self.views, self.viewers, self.pending
+            self.views, self.viewers, self.pending = defaultdict(int), defaultdict(set), 0
+            self.last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        by_increment = defaultdict(list)
+        for post_id, count in views.items():
+            by_increment[count].append(post_id)
+
+        with transaction.atomic():
+            for count, post_ids in by_increment.items():
+                Post.objects.filter(pk__in=post_ids).update(view_count=F('view_count') + count)
+
+            # Registers are merged read-modify-write, so lock the rows.
+            posts = list(
+                Post.objects.filter(pk__in=viewers).select_for_update()
+                .only('id', 'viewers_sketch', 'unique_viewers')
+            )
+            for post in posts:
+                sketch = HyperLogLog(settings.POST_VIEWERS_HLL_PRECISION, bytes(post.viewers_sketch))
+                for viewer_id in viewers[post.id]:
+                    sketch.add(viewer_id)
+                post.viewers_sketch = bytes(sketch.registers)
+                post.unique_viewers = sketch.count()
+            Post.objects.bulk_update(posts, ['viewers_sketch', 'unique_viewers'])
+        invalidate_posts(views)
+        return pending
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_view_buffer():
+    """Return the process-wide view buffer, flushed on interpreter exit."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ViewBuffer()
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def record_view(post, user):
+    get_view_buffer().record([post.pk], user.pk)
+
+
+def record_views(posts, user):
+    """Count one view by ``user`` of each of ``posts``, e.g. the posts on a page."""
+    if posts:
+        get_view_buffer().record([post.pk for post in posts], user.pk)
@@ -1,32 +1,135 @@
 from rest_framework import viewsets, status
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import Post, Comment, Like
-from .serializers import PostSerializer, CommentSerializer
-from rest_framework.generics import ListAPIView
-from notifications.utils import create_notification
+from accounts.models import CustomUser
+from django.db import transaction
+from .models import Post, Comment, Like, PurgeJob
+from .serializers import PostSerializer, CommentSerializer, BulkLikeSerializer, PurgeJobSerializer
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.views import APIView
+from notifications.utils import create_notification, create_notifications
 from rest_framework .decorators import action
+from .timelines import fan_out_post, feed_posts, top_posts, wait_for_new_posts
+from .pagination import (
+    CreatedAtCursorPagination, CommentCursorPagination, FeedCursorPagination,
+    ScoreCursorPagination, decode_cursor, encode_cursor, keyset_filter,
+)
+from .cache import AuthorPageCache, comment_cache, get_posts, post_cache
+from .feed_cache import FeedPageCache, bump_feed_generations, get_cache_stats
+from .pubsub import author_channel, get_broker
+from .search import FullTextSearchFilter
+from .hashtags import index_post_tags, normalize_tag, tagged_posts
+from .mentions import notify_mentions
+from .idempotency import idempotent
+from .fieldsets import sparse_queryset
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework.authtoken.models import Token
+from asgiref.sync import sync_to_async
+import json
+from .counters import adjust_like_count, adjust_like_counts, adjust_comment_count
+from .ranking import refresh_scores, refresh_stale_scores
+from .purge import delete_post
+from .viewcounts import record_view, record_views
+from .trending import COMMENTS, LIKES, METRICS, get_tracker, record_comment, record_likes
 
 #generics.get_object_or_404(Post, pk=pk) 
 #Like.objects.get_or_create(user=request.user, post=post) 
 # Notification.objects.create
 
+def parse_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise NotFound()
+
+
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [SearchFilter, OrderingFilter]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [FullTextSearchFilter, OrderingFilter]
     search_fields = ['title', 'content', 'author__username']
     ordering_fields = ['created_at', 'updated_at']
     filterset_fields = ['title', 'content']
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        refresh_scores([post])
+        index_post_tags(post)
+        notify_mentions(post)
+        fan_out_post(post)
+        transaction.on_commit(lambda: publish_post(post))
+
+    def perform_update(self, serializer):
+        previous_content = serializer.instance.content
+        post = serializer.save()
+        index_post_tags(post)
+        notify_mentions(post, previous_content)
 
     def get_queryset(self):
-        return self.queryset.filter(author=self.request.user)
+        queryset = self.queryset.filter(author=self.request.user)
+        if self.action == 'list':
+            # Load only what ?fields= asks for, plus what the cursor orders on.
+            queryset = sparse_queryset(queryset, self.get_serializer(), always=self.ordering_fields)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return self.list_by_ids(request)
+        return super().list(request, *args, **kwargs)
+
+    def list_by_ids(self, request):
+        """
+        Return the posts named by ``?ids=1,2,3`` (any author's), in that order.
+
+        Posts come from the per-post cache, with one ``IN`` query for the
+        misses. IDs that do not exist are listed in ``not_found``. Each post
+        returned counts as a view.
+        """
+        try:
+            post_ids = [int(post_id) for post_id in request.query_params['ids'].split(',') if post_id.strip()]
+        except ValueError:
+            raise ValidationError({"ids": "Expected a comma-separated list of post IDs."})
+        post_ids = list(dict.fromkeys(post_ids))
+        if len(post_ids) > settings.POST_MULTI_GET_MAX:
+            raise ValidationError({"ids": f"At most {settings.POST_MULTI_GET_MAX} IDs can be requested."})
+
+        posts = get_posts(post_ids)
+        found = [posts[post_id] for post_id in post_ids if post_id in posts]
+        record_views(found, request.user)
+        serializer = self.get_serializer(found, many=True)
+        return Response({
+            "results": serializer.data,
+            "not_found": [post_id for post_id in post_ids if post_id not in posts],
+        })
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Hide the post at once and purge it and its dependents in the
+        background. Answers 202 with the purge job to poll for progress.
+        """
+        job = delete_post(self.get_object(), requested_by=request.user)
+        return Response(PurgeJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Read through the post cache; same visibility as get_queryset.
+        instance = post_cache.get(parse_pk(kwargs['pk']))
+        if instance is None or instance.author_id != request.user.id:
+            raise NotFound()
+        # Buffered in memory; see posts.viewcounts.
+        record_view(instance, request.user)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
 
     def get_object(self):
         obj = super().get_object()
@@ -35,16 +138,23 @@ class PostViewSet(viewsets.ModelViewSet):
         return obj
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def like(self, request, pk=None):
         """Like a post"""
-        post = self.get_object()
+        post = get_object_or_404(Post, pk=pk)
         
-        like, created = Like.objects.get_or_create(
-            post=post,
-            user=request.user
-        )
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(
+                post=post,
+                user=request.user
+            )
+            if created:
+                adjust_like_count(post, 1)
         
-        if not created:
+        if created:
+            bump_feed_generations([request.user.id])
+            record_likes([post.id])
+        else:
             return Response(
                 {"message": "You already liked this post."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -65,46 +175,136 @@ class PostViewSet(viewsets.ModelViewSet):
 
         
     @action(detail=True, methods=['post'])
+    @idempotent
     def unlike(self, request, pk=None):
         """Unlike a post"""
-        post = self.get_object()
+        post = get_object_or_404(Post, pk=pk)
         
-        try:
-            like = Like.objects.get(post=post, user=request.user)
-            like.delete()
-            return Response(
-                {"message": "Post unliked successfully."},
-                status=status.HTTP_200_OK
-            )
-        except Like.DoesNotExist:
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(post=post, user=request.user).delete()
+            if deleted:
+                adjust_like_count(post, -1)
+
+        if deleted:
+            bump_feed_generations([request.user.id])
+        else:
             return Response(
                 {"message": "You haven't liked this post."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
 
-        if user in post.likes.all():
-            post.likes.remove(user)
-            post.save()
-            return Response({'status': 'post unliked'})
+        return Response(
+            {"message": "Post unliked successfully."},
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk-like')
+    def bulk_like(self, request):
+        """Like or unlike many posts at once"""
+        serializer = BulkLikeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        post_ids = list(dict.fromkeys(serializer.validated_data['post_ids']))
+
+        if serializer.validated_data['action'] == 'like':
+            results = self.bulk_like_posts(request.user, post_ids)
         else:
-            return Response({'status': 'post was not liked'}, status=status.HTTP_400_BAD_REQUEST)
+            results = self.bulk_unlike_posts(request.user, post_ids)
+        bump_feed_generations([request.user.id])
+
+        return Response(
+            {"results": [{"post_id": post_id, "status": results[post_id]} for post_id in post_ids]},
+            status=status.HTTP_200_OK
+        )
+
+    def bulk_like_posts(self, user, post_ids):
+        posts = {post.id: post for post in Post.objects.filter(id__in=post_ids).select_related('author')}
+
+        with transaction.atomic():
+            # Transactions take SQLite's write lock when they begin
+            # (transaction_mode IMMEDIATE), so no other request can add these
+            # likes between this lookup and the insert: the lookup decides
+            # which likes are counted and notified. ignore_conflicts only
+            # guards the insert itself.
+            already_liked = set(
+                Like.objects.filter(user=user, post_id__in=posts).values_list('post_id', flat=True)
+            )
+            new_posts = [post for post_id, post in posts.items() if post_id not in already_liked]
+            Like.objects.bulk_create([Like(post=post, user=user) for post in new_posts], ignore_conflicts=True)
+            adjust_like_counts(new_posts, 1)
+        record_likes([post.id for post in new_posts])
+
+        create_notifications(
+            actor=user,
+            verb="liked your post",
+            notifications=[(post.author, post) for post in new_posts]
+        )
+
+        return {
+            post_id: (
+                "not_found" if post_id not in posts
+                else "already_liked" if post_id in already_liked
+                else "liked"
+            )
+            for post_id in post_ids
+        }
+
+    def bulk_unlike_posts(self, user, post_ids):
+        posts = {post.id: post for post in Post.objects.filter(id__in=post_ids)}
+        likes = Like.objects.filter(user=user, post_id__in=posts)
+
+        with transaction.atomic():
+            liked = set(likes.values_list('post_id', flat=True))
+            likes.filter(post_id__in=liked).delete()
+            adjust_like_counts([posts[post_id] for post_id in liked], -1)
+
+        return {
+            post_id: (
+                "not_found" if post_id not in posts
+                else "unliked" if post_id in liked
+                else "not_liked"
+            )
+            for post_id in post_ids
+        }
 
 class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CommentCursorPagination
 
     def get_queryset(self):
         post_pk = self.kwargs.get('post_pk')
-        queryset = Comment.objects.all()
-        
-        return queryset.filter(post_id=post_pk)
+        # Comments of a soft-deleted post go with it, though their rows
+        # are only removed by the purge job.
+        queryset = Comment.objects.filter(post_id=post_pk, post__deleted_at__isnull=True)
+        if self.action == 'list':
+            # Authors are joined in (when author_username is rendered) so a
+            # page never loads them per row.
+            return sparse_queryset(queryset, self.get_serializer(), always=['created_at'])
+        return queryset.select_related('author')
 
     def perform_create(self, serializer):
         post_pk = self.kwargs.get('post_pk')
         if post_pk is None:
             raise ValueError("Missing post_pk in URL")
-        serializer.save(author=self.request.user, post_id=post_pk)
+        post = get_object_or_404(Post, pk=post_pk)
+        with transaction.atomic():
+            serializer.save(author=self.request.user, post=post)
+            adjust_comment_count(post, 1)
+        record_comment(post.id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            adjust_comment_count(instance.post, -1)
+
+    def retrieve(self, request, *args, **kwargs):
+        comment = comment_cache.get(kwargs['pk'])
+        if comment is None or comment.post_id != kwargs['post_pk'] or post_cache.get(comment.post_id) is None:
+            raise NotFound()
+        if comment.author_id != request.user.id:
+            raise PermissionDenied("You do not own this comment")
+        serializer = self.get_serializer(comment)
+        return Response(serializer.data)
 
     def get_object(self):
         post_pk = self.kwargs.get('post_pk')
@@ -113,7 +313,8 @@ class CommentViewSet(viewsets.ModelViewSet):
         obj = get_object_or_404(
             Comment,
             pk=comment_pk,
-            post_id=post_pk
+            post_id=post_pk,
+            post__deleted_at__isnull=True
         )
 
         if obj.author != self.request.user:
@@ -124,10 +325,273 @@ class CommentViewSet(viewsets.ModelViewSet):
 class UserFeedView(ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FeedCursorPagination
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['comment_preview'] = settings.FEED_COMMENT_PREVIEW_COUNT
+        return context
+
+    def list(self, request, *args, **kwargs):
+        if 'since' in request.query_params:
+            return self.list_since(request)
+
+        page_cache = FeedPageCache(request)
+        data = page_cache.get()
+        if data is not None:
+            return Response(data, headers={'X-Feed-Cache': 'HIT'})
+
+        response = self.list_page(request)
+        page_cache.set(response.data)
+        response['X-Feed-Cache'] = 'MISS'
+        return response
+
+    def list_page(self, request):
+        if request.query_params.get('mode') == 'top':
+            paginator = ScoreCursorPagination()
+            page = paginator.paginate_queryset(top_posts(request.user), request, self)
+            # Scores of hot posts lag their likes; catch them up for the next read.
+            refresh_stale_scores(page)
+            serializer = self.get_serializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        # The feed is merged from two ordered sources, so the cursor is
+        # pushed down into each source rather than applied to one queryset.
+        paginator = self.paginator
+        posts = feed_posts(
+            request.user,
+            before=paginator.get_position(request),
+            limit=paginator.get_page_size(request) + 1,
+        )
+        page = paginator.paginate_items(posts, request)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def list_since(self, request):
+        """
+        Return only the posts newer than the ``since`` cursor, newest first.
+
+        Answers 204 No Content when nothing is new. With ``wait=<seconds>``
+        the request is held (up to ``FEED_LONG_POLL_MAX_SECONDS``) until a
+        new post arrives. At most ``page_size`` posts are returned; when
+        ``has_more`` is true, call again with the returned ``latest``.
+        """
+        after = decode_cursor(request.query_params['since'])
+        try:
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            wait = 0
+        wait = min(max(wait, 0), settings.FEED_LONG_POLL_MAX_SECONDS)
+
+        if not wait_for_new_posts(request.user, after, wait):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        limit = self.paginator.get_page_size(request)
+        posts = feed_posts(request.user, after=after, limit=limit + 1)
+        if not posts:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        has_more = len(posts) > limit
+        posts = posts[:limit][::-1]
+
+        serializer = self.get_serializer(posts, many=True)
+        return Response({
+            "latest": encode_cursor((posts[0].created_at, posts[0].id)),
+            "has_more": has_more,
+            "results": serializer.data,
+        })
+
+
+class AuthorPostsView(ListAPIView):
+    """
+    A user's posts, newest first, paged by cursor over the
+    ``(author, created_at, id)`` index.
+
+    The first page's post IDs are cached (see ``posts.cache.AuthorPageCache``)
+    and the posts read through the post cache, so a hit only queries which
+    posts the viewer has liked. Each post on the page counts as a view.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        author_id = kwargs['user_id']
+        paginator = self.paginator
+        position = paginator.get_position(request)
+        limit = paginator.get_page_size(request) + 1
+
+        page_cache = AuthorPageCache(author_id, limit) if position is None else None
+        post_ids = page_cache.get() if page_cache else None
+        if post_ids is not None:
+            posts = get_posts(post_ids)
+            items = [posts[post_id] for post_id in post_ids if post_id in posts]
+        else:
+            get_object_or_404(CustomUser, pk=author_id, is_active=True)
+            queryset = post_cache.get_queryset().filter(author_id=author_id)
+            if position is not None:
+                queryset = queryset.filter(keyset_filter(paginator.ordering, position))
+            items = list(queryset.order_by(*paginator.ordering)[:limit])
+            if page_cache:
+                post_cache.set_many(items)
+                page_cache.set([post.id for post in items])
+
+        page = paginator.paginate_items(items, request)
+        record_views(page, request.user)
+        serializer = self.get_serializer(page, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        if page_cache:
+            response['X-Author-Page-Cache'] = 'MISS' if post_ids is None else 'HIT'
+        return response
+
+
+class TagPostsView(ListAPIView):
+    """
+    Posts tagged ``#<tag>`` (any author's), newest first, read from the
+    hashtag index in ``posts.hashtags`` and paged by cursor.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        tag = normalize_tag(kwargs['tag'])
+        if not tag:
+            raise NotFound()
+        paginator = self.paginator
+        posts = sparse_queryset(
+            tagged_posts(tag, before=paginator.get_position(request)),
+            self.get_serializer(),
+            always=['created_at'],
+        )
+        page = paginator.paginate_items(posts[:paginator.get_page_size(request) + 1], request)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class TrendingView(APIView):
+    """
+    Most-liked and most-commented posts over a sliding ``window`` (one of
+    ``TRENDING_WINDOWS``, default ``24h``). Counts are estimates from
+    ``posts.trending``, not exact totals.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        window = request.query_params.get('window', '24h')
+        if window not in settings.TRENDING_WINDOWS:
+            raise ValidationError({"window": f"Choose one of: {', '.join(settings.TRENDING_WINDOWS)}."})
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        limit = min(max(limit, 1), 50)
+
+        tracker = get_tracker()
+        top = {metric: tracker.top(metric, window, limit) for metric in METRICS}
+        posts = Post.objects.select_related('author').in_bulk(
+            {post_id for counts in top.values() for post_id, _ in counts}
+        )
+        # Serialize every post at once so likes are hydrated in one batch.
+        data = dict(zip(posts, self.serialize_posts(list(posts.values()))))
+
+        return Response({
+            "window": window,
+            "most_liked": [
+                {"count": count, "post": data[post_id]} for post_id, count in top[LIKES] if post_id in data
+            ],
+            "most_commented": [
+                {"count": count, "post": data[post_id]} for post_id, count in top[COMMENTS] if post_id in data
+            ],
+        })
+
+    def serialize_posts(self, posts):
+        return PostSerializer(posts, many=True, context={'request': self.request}).data
+
+
+class PurgeJobView(RetrieveAPIView):
+    """Progress of a background purge started by deleting a post or account."""
+    serializer_class = PurgeJobSerializer
+    permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        following_users = user.following.all()
-        return Post.objects.filter(author__in=following_users).order_by('-created_at')
+        if self.request.user.is_staff:
+            return PurgeJob.objects.all()
+        return PurgeJob.objects.filter(requested_by=self.request.user)
+
+
+class FeedCacheStatsView(APIView):
+    """Hit/miss counters of the feed page cache."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_cache_stats())
+
+
+def publish_post(post):
+    """Push a new post to live feed streams following its author."""
+    get_broker().publish(author_channel(post.author_id), {
+        "cursor": encode_cursor((post.created_at, post.id)),
+        "post": PostSerializer(post).data,
+    })
+
+
+def format_event(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+@sync_to_async
+def catch_up_events(user, last_event_id):
+    """Events for posts missed while a client was reconnecting."""
+    posts = feed_posts(user, after=decode_cursor(last_event_id), limit=FeedCursorPagination.page_size)
+    data = PostSerializer(posts, many=True).data
+    return [
+        format_event("post", {"post": item}, encode_cursor((post.created_at, post.id)))
+        for post, item in zip(posts, data)
+    ]
+
+
+async def feed_stream(request):
+    """
+    Stream new posts from followed authors as Server-Sent Events.
+
+    Each ``post`` event carries the serialized post, and its ``id`` is a feed
+    cursor, so a reconnecting client (``Last-Event-ID``) first gets what it
+    missed. Comment lines are sent every ``FEED_STREAM_KEEPALIVE_SECONDS``
+    to keep proxies from closing an idle connection. Requires an ASGI server.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse("Feed streaming requires an ASGI server.", status=501)
+
+    keyword, _, key = request.headers.get("Authorization", "").partition(" ")
+    try:
+        token = await Token.objects.select_related("user").aget(key=key) if keyword == "Token" else None
+    except Token.DoesNotExist:
+        token = None
+    if token is None or not token.user.is_active:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    user = token.user
+    channels = [author_channel(author_id) async for author_id in user.following.values_list("id", flat=True)]
+    last_event_id = request.headers.get("Last-Event-ID")
+
+    async def events():
+        async with get_broker().subscribe(channels) as subscription:
+            yield "retry: 5000\n\n"
+            if last_event_id:
+                for event in await catch_up_events(user, last_event_id):
+                    yield event
+            while True:
+                message = await subscription.get(timeout=settings.FEED_STREAM_KEEPALIVE_SECONDS)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield format_event("post", {"post": message["post"]}, message["cursor"])
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 #permissions.IsAuthenticated
\ No newline at end of file
@@ -2,6 +2,8 @@
 ASGI config for social_media_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The live feed stream (/api/feed/stream/) is only served under ASGI, e.g.
+``uvicorn social_media_api.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +16,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
 
 application = get_asgi_application()
+
+from posts.trending import start_snapshot_thread  # noqa: E402
+
+start_snapshot_thread()
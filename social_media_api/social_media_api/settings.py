@@ -82,10 +82,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # SQLite has no SELECT ... FOR UPDATE. Taking the write lock when a
+        # transaction begins serializes read-then-write blocks such as the
+        # bulk like lookup, and makes writers wait for the lock instead of
+        # failing with "database is locked" halfway through.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Stored Idempotency-Key responses, kept apart so feed and post entries
+    # cannot evict them before IDEMPOTENCY_KEY_TIMEOUT. Use a backend shared
+    # by every worker when running more than one.
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'idempotency',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -148,6 +171,107 @@ REST_FRAMEWORK = {
     },
 }
 
+# Feed timelines
+# Posts are fanned out to followers' timelines in batches of this size.
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+# Number of recent posts copied into a timeline when following someone.
+TIMELINE_BACKFILL_LIMIT = 200
+# Follow/unfollow queue a timeline task that `manage.py run_timeline_tasks`
+# works through in chunks of this many posts. Set TIMELINE_TASKS_EAGER to run
+# them right after the request's transaction commits instead.
+TIMELINE_TASK_CHUNK_SIZE = 100
+TIMELINE_TASKS_EAGER = False
+# Authors with at least this many followers are not fanned out; their posts
+# are merged into followers' feeds at read time instead.
+FEED_PULL_FOLLOWER_THRESHOLD = 10000
+# Longest a ?since= feed request may be held waiting for new posts, and how
+# often (in seconds) the cache is checked while it waits.
+FEED_LONG_POLL_MAX_SECONDS = 25
+FEED_LONG_POLL_INTERVAL = 0.5
+# Pub/sub backend that carries new posts to /api/feed/stream/ connections,
+# and how often an idle stream sends a keep-alive comment.
+FEED_PUBSUB_BACKEND = 'posts.pubsub.InProcessBroker'
+FEED_STREAM_KEEPALIVE_SECONDS = 15
+# "Top" feed ranking: each this many seconds of recency is worth ten times
+# the engagement (likes + weighted comments).
+FEED_TOP_DECAY_SECONDS = 45000
+FEED_TOP_COMMENT_WEIGHT = 2
+# Hot (sharded) posts refresh their score at most this often.
+FEED_TOP_SHARDED_REFRESH_SECONDS = 10
+# The first FEED_CACHE_PAGES pages of each user's feed are cached for
+# FEED_CACHE_TIMEOUT seconds, or until new posts or follows invalidate them.
+FEED_CACHE_PAGES = 3
+FEED_CACHE_TIMEOUT = 30
+# Number of newest comments embedded under each feed post (0 to disable).
+FEED_COMMENT_PREVIEW_COUNT = 3
+
+# Trending posts
+# Sliding windows served by /api/trending/, as (window, bucket) seconds; each
+# window slides forward one bucket at a time.
+TRENDING_WINDOWS = {
+    '1h': (3600, 300),
+    '24h': (86400, 3600),
+    '7d': (604800, 21600),
+}
+# Count-min sketch size per bucket and how many heavy hitters each bucket keeps.
+TRENDING_SKETCH_WIDTH = 1024
+TRENDING_SKETCH_DEPTH = 4
+TRENDING_CANDIDATES = 100
+# Seconds between snapshots of the trending counters to the database, taken by
+# a background thread in each worker.
+TRENDING_SNAPSHOT_SECONDS = 60
+
+# Idempotency keys
+# Responses to requests sent with an Idempotency-Key are replayed to retries
+# for this many seconds. A retry arriving while the first request still holds
+# its IDEMPOTENCY_LOCK_TIMEOUT-second lock gets 409 Conflict.
+IDEMPOTENCY_KEY_TIMEOUT = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+
+# Post cache
+# Seconds posts and comments read through posts.cache stay cached, and the
+# most IDs one /api/posts/?ids= request may ask for.
+POST_CACHE_TIMEOUT = 300
+COMMENT_CACHE_TIMEOUT = 300
+POST_MULTI_GET_MAX = 200
+# Nonexistent IDs are remembered for this many seconds.
+OBJECT_CACHE_MISSING_TIMEOUT = 30
+# On a miss one request reloads the row; others poll the cache every
+# OBJECT_CACHE_LOCK_POLL_INTERVAL seconds for up to OBJECT_CACHE_LOCK_TIMEOUT.
+OBJECT_CACHE_LOCK_TIMEOUT = 2
+OBJECT_CACHE_LOCK_POLL_INTERVAL = 0.05
+# Seconds the first page of /api/users/<id>/posts/ is cached for; creating,
+# editing or deleting a post drops it sooner.
+AUTHOR_PAGE_CACHE_TIMEOUT = 60
+
+# Deleting a post or account hides it at once and queues a PurgeJob that
+# `manage.py run_purge_jobs` works through PURGE_BATCH_SIZE rows at a time.
+# PURGE_JOBS_EAGER runs jobs right after the request commits instead.
+PURGE_BATCH_SIZE = 500
+PURGE_JOBS_EAGER = False
+
+# Post views
+# Views are buffered in memory and flushed once this many are pending or this
+# many seconds have passed since the last flush.
+POST_VIEW_FLUSH_THRESHOLD = 100
+POST_VIEW_FLUSH_SECONDS = 10
+# Unique viewers use a HyperLogLog of 2 ** precision one-byte registers;
+# standard error is 1.04 / sqrt(2 ** precision), 3.25% at 10.
+POST_VIEWERS_HLL_PRECISION = 10
+
+# Mentions
+# Only the first POST_MENTION_LIMIT distinct @usernames in a post are
+# notified, so a post costs the same two queries however many it names.
+POST_MENTION_LIMIT = 20
+
+# Like counters
+# Posts liked this many times within a minute switch to sharded counting.
+LIKE_SHARD_PROMOTION_RATE = 100
+# Number of counter shards a hot post's likes are spread over.
+LIKE_COUNTER_SHARDS = 16
+# Seconds a sharded post's summed like total is cached for.
+LIKE_TOTAL_CACHE_TIMEOUT = 5
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
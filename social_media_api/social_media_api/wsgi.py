@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
 
 application = get_wsgi_application()
+
+from posts.trending import start_snapshot_thread  # noqa: E402
+
+start_snapshot_thread()